@@ -1,21 +1,38 @@
+import time
+_SCRIPT_START = time.perf_counter()  # Inicio de esta ejecución del script (arranque y recargas)
+
 import streamlit as st
 import openai
 import os
 from dotenv import load_dotenv
-from pdf2image import convert_from_bytes
-from PIL import Image
-import base64
-import io
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Callable, Tuple
 from dataclasses import dataclass
+import functools
 import json
+import re
+import hashlib
+import sqlite3
+import threading
+import queue
+import tempfile
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from datetime import datetime
 from streamlit_option_menu import option_menu
+import pdf_workers
+from prompts import PROMPTS
 
-# Configuración
-load_dotenv()
-# Obtener la clave API de los secrets de Streamlit
-# openai.api_key = os.getenv("OPENAI_API_KEY")
-openai.api_key = st.secrets["openai"]["OPENAI_API_KEY"]
+@st.cache_resource(show_spinner=False)
+def configure_openai():
+    """Configura la clave API una sola vez por proceso.
+    Se leen los secrets de Streamlit; fuera de Streamlit (CLI, servicio HTTP) se usa la variable de entorno."""
+    load_dotenv()
+    try:
+        openai.api_key = st.secrets["openai"]["OPENAI_API_KEY"]
+    except (FileNotFoundError, KeyError):
+        openai.api_key = os.getenv("OPENAI_API_KEY")
 
 @dataclass
 class Config:
@@ -24,62 +41,244 @@ class Config:
     CHUNK_SIZE: int = 2000
     OCR_MODEL: str = "gpt-4o"
     CORRECTION_MODEL: str = "gpt-3.5-turbo"
-    THUMBNAIL_SIZE: tuple = (300, 400)  # Tamaño de las miniaturas
+    CASE_STORE_PATH: str = os.getenv("JNCI_CASE_STORE", "casos.db")  # Base local de dictámenes procesados
+    SHOW_TIMINGS: bool = os.getenv("JNCI_SHOW_TIMINGS") == "1"  # Muestra los tiempos de arranque y recarga
+    CACHE_MAX_ENTRIES: int = 2000  # Respuestas de OpenAI en caché
+    CACHE_TTL_SECONDS: int = 24 * 60 * 60  # Vigencia de cada respuesta en caché
+    RENDER_DPI: int = 200  # Resolución de rasterización (sin OCR adaptativo)
+    ADAPTIVE_OCR: bool = True  # OCR a baja resolución y reintento en alta solo para páginas dudosas
+    ADAPTIVE_LOW_DPI: int = 100
+    ADAPTIVE_HIGH_DPI: int = 300
+    OCR_RETRY_THRESHOLD: float = 0.6  # Puntaje mínimo de calidad para aceptar una página
+    OCR_CHARS_PER_INK: int = 30000  # Caracteres esperados por unidad de densidad de tinta
+    OCR_TILES: int = 0  # Franjas por página densa para OCR por partes (0 = desactivado)
+    TILE_OVERLAP: float = 0.15  # Fracción de cada franja compartida con sus vecinas
+    TILE_MIN_INK: float = 0.08  # Densidad de tinta a partir de la cual una página se considera densa
+    TILE_DPI: int = 200
+    BATCH_POLL_SECONDS: int = 60  # Intervalo de consulta del estado de un lote
+    BATCH_MAX_BYTES: int = 150 * 1024 * 1024  # Tamaño máximo de cada archivo JSONL de lote
+    BATCH_MAX_REQUESTS: int = 50000  # Solicitudes máximas por lote
+    BATCH_MAX_ROUNDS: int = 10  # Rondas de lotes antes de dar por fallidos los documentos pendientes
+    DOCUMENT_BUDGET_SECONDS: float = 600  # Tiempo máximo por documento
+    OCR_BUDGET_SHARE: float = 0.7  # Fracción del presupuesto disponible para el OCR (el resto, para la extracción)
+    REQUEST_TIMEOUT: float = 120  # Tiempo máximo por llamada a la API
+    RENDER_WORKERS: int = os.cpu_count() or 1  # Procesos para rasterizar y codificar páginas
+    PAGES_PER_TASK: int = 2  # Páginas por tarea de rasterización
+    PIPELINE_QUEUE_SIZE: int = 16  # Páginas codificadas en espera de OCR (contrapresión)
+    OCR_WORKERS: int = 8  # Páginas en OCR simultáneo por documento
+    OCR_POOL_WORKERS: int = 32  # Hilos de OCR compartidos por todas las sesiones
 
-class PDFProcessor:
-    """Clase para procesar documentos PDF"""
-    
-    @staticmethod
-    def convert_pdf_to_images(pdf_bytes: bytes) -> List[Image.Image]:
-        """Convierte un PDF a una lista de imágenes"""
-        return convert_from_bytes(pdf_bytes)
-    
-    @staticmethod
-    def image_to_base64(image: Image.Image) -> str:
-        """Convierte una imagen a formato base64"""
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el tiempo asignado al procesamiento de un documento"""
+
+class Deadline:
+    """Presupuesto de tiempo de un documento, del que se derivan los tiempos máximos por llamada"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def call_timeout(self, cap: float) -> float:
+        """Tiempo máximo para la siguiente llamada; lanza DeadlineExceeded si ya no queda tiempo"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Se agotó el tiempo asignado al documento")
+        return min(remaining, cap)
+
+    def share(self, fraction: float) -> "Deadline":
+        """Sub-presupuesto con una fracción del tiempo restante"""
+        return Deadline(self.remaining() * fraction)
+
+class RequestRecorder:
+    """Registra, en lugar de enviarlas, las llamadas que no están en caché (modo por lotes).
+
+    Las llamadas registradas retornan un texto vacío. Como las llamadas posteriores de otra
+    operación dependerían de ese texto vacío, solo se registran llamadas de las operaciones
+    que ya tenían solicitudes pendientes; el resto se registrará en la siguiente ronda."""
+
+    def __init__(self):
+        self.requests = {}
+        self.operations = set()
+
+    def record(self, key: str, operation: str, body: Dict):
+        if self.operations and operation not in self.operations:
+            return
+        self.operations.add(operation)
+        self.requests[key] = body
+
+class ResultCache:
+    """Caché en memoria (LRU con expiración) de respuestas de OpenAI, compartida entre sesiones"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
     @staticmethod
-    def create_thumbnail(image: Image.Image, size: tuple) -> Image.Image:
-        """Crea una miniatura de la imagen"""
-        return image.copy().thumbnail(size, Image.Resampling.LANCZOS)
+    def _hash(value) -> str:
+        """Hash estable de un texto (con espacios normalizados) o de una estructura JSON"""
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        else:
+            value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_key(cls, operation: str, model: str, messages: List[Dict], max_tokens: int) -> str:
+        """Clave: operación, modelo, hash del prompt de sistema y hash del contenido del usuario.
+        Cualquier cambio en el prompt de sistema genera claves nuevas (invalidación automática)."""
+        system_prompt = [m["content"] for m in messages if m["role"] == "system"]
+        user_content = [m["content"] for m in messages if m["role"] != "system"]
+        return "|".join([
+            operation,
+            model,
+            str(max_tokens),
+            hashlib.sha256(json.dumps(system_prompt, ensure_ascii=False).encode("utf-8")).hexdigest(),
+            cls._hash(user_content[0] if len(user_content) == 1 else user_content)
+        ])
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna la respuesta almacenada, o None si no existe o ya expiró"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: str):
+        """Almacena una respuesta, descartando las menos usadas si se supera el tamaño máximo"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        """Elimina una entrada (p. ej. una respuesta que no se pudo interpretar)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def summary(self) -> Dict:
+        """Entradas almacenadas, aciertos, fallos y proporción de aciertos desde el inicio del proceso"""
+        with self._lock:
+            entries, hits, misses = len(self._entries), self.hits, self.misses
+        return {
+            "entradas": entries,
+            "aciertos": hits,
+            "fallos": misses,
+            "proporcion_aciertos": round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+
+class PromptCacheStats:
+    """Tokens de entrada por operación y cuántos de ellos sirvió el proveedor desde su caché de prefijos"""
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, usage: Optional[Dict]):
+        """Acumula el uso reportado en una respuesta de ChatCompletion"""
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        with self._lock:
+            stats = self._operations.setdefault(operation, {"llamadas": 0, "tokens_entrada": 0, "tokens_en_cache": 0})
+            stats["llamadas"] += 1
+            stats["tokens_entrada"] += usage.get("prompt_tokens") or 0
+            stats["tokens_en_cache"] += details.get("cached_tokens") or 0
+
+    def summary(self) -> Dict[str, Dict]:
+        """Por operación: versión del prompt, llamadas, tokens de entrada, tokens en caché y proporción"""
+        with self._lock:
+            operations = {operation: dict(stats) for operation, stats in self._operations.items()}
+        for operation, stats in operations.items():
+            prompt = PROMPTS.get(operation)
+            stats["version_prompt"] = prompt.version if prompt else None
+            stats["proporcion_cache"] = (
+                round(stats["tokens_en_cache"] / stats["tokens_entrada"], 3) if stats["tokens_entrada"] else 0.0
+            )
+        return operations
 
 class OpenAIService:
     """Clase para manejar las interacciones con OpenAI"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, cache: Optional[ResultCache] = None, deadline: Optional[Deadline] = None,
+                 recorder: Optional[RequestRecorder] = None, prompt_stats: Optional[PromptCacheStats] = None):
         self.config = config
+        self.cache = cache
+        self.deadline = deadline
+        self.recorder = recorder
+        self.prompt_stats = prompt_stats
+
+    def with_deadline(self, deadline: Optional[Deadline]) -> "OpenAIService":
+        """Copia del servicio cuyas llamadas respetan el presupuesto de tiempo indicado"""
+        return OpenAIService(self.config, self.cache, deadline, prompt_stats=self.prompt_stats)
+
+    def _chat(self, operation: str, model: str, messages: List[Dict], max_tokens: int) -> str:
+        """Llama a ChatCompletion pasando primero por la caché de resultados.
+        Con un RequestRecorder, las llamadas que no están en caché se registran en lugar de enviarse."""
+        key = ResultCache.make_key(operation, model, messages, max_tokens) if self.cache or self.recorder else None
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        if self.recorder is not None:
+            self.recorder.record(key, operation, {"model": model, "messages": messages, "max_tokens": max_tokens})
+            return ""
+
+        timeout = self.deadline.call_timeout(self.config.REQUEST_TIMEOUT) if self.deadline else self.config.REQUEST_TIMEOUT
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            request_timeout=timeout
+        )
+        content = response.choices[0].message.content
+        if self.prompt_stats:
+            self.prompt_stats.record(operation, response.get("usage"))
+        if self.cache:
+            self.cache.set(key, content)
+        return content
+
+    def _chat_json(self, operation: str, model: str, messages: List[Dict], max_tokens: int) -> Dict:
+        """Igual que _chat, pero interpreta la respuesta como JSON (sin guardar respuestas inválidas)"""
+        content = self._chat(operation, model=model, messages=messages, max_tokens=max_tokens)
+        if self.recorder is not None and not content:
+            return {}
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            key = ResultCache.make_key(operation, model, messages, max_tokens)
+            if self.cache:
+                self.cache.discard(key)
+            if self.recorder is not None:
+                # Respuesta inválida de un lote: se vuelve a solicitar en la siguiente ronda
+                self.recorder.record(key, operation, {"model": model, "messages": messages, "max_tokens": max_tokens})
+                return {}
+            raise
     
     def extract_text_from_image(self, base64_image: str) -> str:
         """Extrae texto de una imagen usando GPT-4 Vision"""
-        response = openai.ChatCompletion.create(
+        return self._chat(
+            "extract_text_from_image",
             model=self.config.OCR_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Eres un OCR especializado. Extrae el texto de la imagen y devuélvelo exactamente como aparece, sin hacer correcciones. Mantén el formato y la estructura del texto original."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        },
-                        {
-                            "type": "text",
-                            "text": "Extrae el texto de esta imagen manteniendo el formato original."
-                        }
-                    ]
-                }
-            ],
+            messages=PROMPTS["extract_text_from_image"].image_messages(base64_image),
             max_tokens=self.config.MAX_TOKENS
         )
-        return response.choices[0].message.content
     
     def correct_text(self, text: str) -> str:
         """Corrige la ortografía del texto usando GPT-4"""
@@ -87,155 +286,64 @@ class OpenAIService:
         corrected_text = ""
         
         for chunk in chunks:
-            response = openai.ChatCompletion.create(
+            content = self._chat(
+                "correct_text",
                 model=self.config.CORRECTION_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un corrector ortográfico especializado. Corrige solo errores ortográficos manteniendo el significado y estructura original del texto. No cambies palabras, puntuación ni estructura, incluso si no tiene sentido. Mantén el formato y los saltos de línea."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Corrige la ortografía del siguiente texto manteniendo su estructura y formato:\n\n{chunk}"
-                    }
-                ],
+                messages=PROMPTS["correct_text"].messages(chunk),
                 max_tokens=self.config.MAX_TOKENS
             )
-            corrected_text += response.choices[0].message.content + "\n"
+            corrected_text += content + "\n"
         
         return corrected_text
 
     def extract_junta_location(self, text: str) -> str:
         """Extrae la ubicación de la Junta Regional del texto"""
-        response = openai.ChatCompletion.create(
+        content = self._chat(
+            "extract_junta_location",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en identificar la ubicación de Juntas Regionales de Calificación.
-                    Extrae el departamento o ciudad donde se realizó la Junta Regional.
-                    Devuelve solo el nombre del departamento o ciudad, sin texto adicional."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Identifica el departamento o ciudad donde se realizó esta Junta Regional de Calificación:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_junta_location"].messages(text),
             max_tokens=100
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
     def extract_analysis_and_conclusions(self, text: str) -> str:
         """Extrae el análisis y conclusiones de la Junta Regional"""
-        response = openai.ChatCompletion.create(
+        content = self._chat(
+            "extract_analysis_and_conclusions",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en identificar análisis y conclusiones de Juntas Regionales de Calificación.
-                    Busca en el texto:
-                    1. Primero, la sección específica llamada "ANÁLISIS Y CONCLUSIONES", que se ubica al final del acta, luego de la sección de "Fundamentos de derecho"
-                    2. Luego busca la valoración del calificador y equipo interdisciplinario, esta se encuentra luego de la sección de "Concepto de rehabilitación"
-                    3. También incluye la sección de "otros conceptos técnicos" si es relevante
-                    
-                    Extrae solo el texto de estas secciones concatendado uno debajo del otro, corrigiendo los errores de ortografía, sin modificar el formato original.
-                    No incluyas conclusiones de otras entidades, solo las de la Junta Regional."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae el análisis y conclusiones de la Junta Regional del siguiente texto:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_analysis_and_conclusions"].messages(text),
             max_tokens=self.config.MAX_TOKENS
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
     def extract_medical_concepts(self, text: str) -> str:
         """Extrae los conceptos médicos del texto"""
-        response = openai.ChatCompletion.create(
+        content = self._chat(
+            "extract_medical_concepts",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en identificar conceptos médicos en actas de Junta Regional de Calificación.
-                    Busca en el texto:
-                    1. La sección "CONCEPTOS MÉDICOS"
-                    2. La sección "PRUEBAS ESPECÍFICAS"
-                    
-                    Extrae el texto exactamente como aparece en estas secciones, sin modificarlo.
-                    Si no encuentras estas secciones, devuelve un mensaje indicando que no se encontraron conceptos médicos."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae los conceptos médicos del siguiente texto:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_medical_concepts"].messages(text),
             max_tokens=self.config.MAX_TOKENS
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
     def extract_recurring_name(self, text: str) -> str:
         """Extrae el nombre de la persona que interpone el recurso"""
-        response = openai.ChatCompletion.create(
+        content = self._chat(
+            "extract_recurring_name",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en identificar el nombre de la persona que interpone un recurso de reposición.
-                    Busca en el texto el nombre de la persona que presenta el recurso.
-                    Devuelve solo el nombre completo de la persona, sin texto adicional."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Identifica el nombre de la persona que interpone el recurso de reposición en el siguiente texto:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_recurring_name"].messages(text),
             max_tokens=100
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
     def extract_pcl_info(self, text: str) -> Dict:
         """Extrae toda la información relevante para el dictamen PCL"""
-        response = openai.ChatCompletion.create(
+        return self._chat_json(
+            "extract_pcl_info",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en extraer información de dictámenes de PCL de Juntas Regionales de Calificación.
-                    Extrae la siguiente información en formato JSON:
-                    {
-                        "ubicacion": "string",
-                        "numero_dictamen": "string",
-                        "fecha_dictamen": "string",
-                        "diagnosticos": ["string"],
-                        "deficiencia_total": "string",
-                        "rol_laboral": "string",
-                        "pcl_total": "string",
-                        "origen": "string",
-                        "fecha_estructuracion": "string",
-                        "deficiencias_calificadas": [
-                            {
-                                "nombre": "string",
-                                "porcentaje": "string",
-                                "fuente": "string (formato: Tabla X.Y)"
-                            }
-                        ],
-                        "analisis_conclusiones": "string",
-                        "valoracion_calificador": "string",
-                        "otros_conceptos": "string"
-                    }
-                    Para la fuente de las deficiencias calificadas, extrae específicamente:
-                    - La tabla en formato "Tabla X.Y" (ejemplo: "Tabla 13.4")
-                    Si algún campo no se encuentra, déjalo como null."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae la información del dictamen PCL del siguiente texto:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_pcl_info"].messages(text),
             max_tokens=self.config.MAX_TOKENS
         )
-        return json.loads(response.choices[0].message.content)
 
     def generate_pcl_template(self, pcl_info: Dict) -> str:
         """Genera la plantilla del dictamen PCL con la información extraída"""
@@ -285,57 +393,23 @@ class OpenAIService:
 
     def process_recurring_text(self, text: str) -> str:
         """Procesa el texto del recurso de reposición"""
-        response = openai.ChatCompletion.create(
+        content = self._chat(
+            "process_recurring_text",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en procesar textos de recursos de reposición.
-                    Extrae únicamente el texto que fundamenta la motivación de la inconformidad.
-                    Sigue estas reglas:
-                    1. Elimina pies de página y referencias a leyes citadas textualmente
-                    2. Mantén solo el texto que explica los argumentos y razones de la inconformidad
-                    3. Aplica corrección ortográfica básica sin cambiar el significado
-                    4. Si hay bloques en MAYÚSCULAS, conviértelos a minúsculas siguiendo reglas gramaticales
-                    5. Mantén la estructura y formato del texto principal"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae solo el texto principal que fundamenta la motivación de inconformidad del siguiente recurso, eliminando pies de página y citas textuales de leyes:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["process_recurring_text"].messages(text),
             max_tokens=self.config.MAX_TOKENS
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
     def extract_recurring_entity(self, text: str) -> str:
         """Extrae el nombre o entidad que presenta el recurso"""
-        response = openai.ChatCompletion.create(
+        content = self._chat(
+            "extract_recurring_entity",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en identificar quién presenta un recurso de reposición.
-                    Busca:
-                    1. Si es una persona natural:
-                       - Si es hombre: "El señor [Nombre completo]"
-                       - Si es mujer: "La señora [Nombre completo]"
-                       - Si es apoderado: "El apoderado del señor/señora [Nombre completo]"
-                    2. Si es una entidad, identifica el tipo:
-                       - Administradora de Riesgos Laborales (NOMBRE)
-                       - Entidad Prestadora de Salud (NOMBRE)
-                       - Administradora de Fondos Pensionales (NOMBRE)
-                    Si no puedes determinar con certeza, devuelve "[Entidad no identificada]"
-                    Devuelve solo el texto con el formato especificado."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Identifica quién presenta este recurso de reposición:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_recurring_entity"].messages(text),
             max_tokens=100
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
     def generate_recurring_template(self, entity: str, text: str) -> str:
         """Genera la plantilla para el recurso de reposición"""
@@ -346,75 +420,12 @@ class OpenAIService:
 
     def extract_first_opportunity_info(self, text: str) -> Dict:
         """Extrae toda la información relevante para la Calificación en primera oportunidad"""
-        response = openai.ChatCompletion.create(
+        return self._chat_json(
+            "extract_first_opportunity_info",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en extraer información de calificaciones en primera oportunidad.
-                    Extrae la siguiente información en formato JSON:
-                    {
-                        "tipo_entidad": "string (EPS/ARL/AFP)",
-                        "nombre_entidad": "string (en mayúsculas)",
-                        "diagnosticos": [
-                            {
-                                "diagnostico": "string",
-                                "diagnostico_especifico": "string",
-                                "lateralidad": "string",
-                                "origen": "string"
-                            }
-                        ],
-                        "deficiencias": [
-                            {
-                                "nombre": "string",
-                                "porcentaje": "string"
-                            }
-                        ],
-                        "deficiencia_total": "string",
-                        "rol_laboral": "string",
-                        "pcl_total": "string",
-                        "origen": "string",
-                        "fecha_estructuracion": "string",
-                        "conceptos_medicos": [
-                            {
-                                "especialidad": "string (ej: ortopedia, fisiatría)",
-                                "concepto": "string (texto del concepto)",
-                                "fecha": "string (fecha de la historia clínica)",
-                                "nombre_historia": "string (nombre de la historia clínica)"
-                            }
-                        ],
-                        "pruebas_especificas": [
-                            {
-                                "tipo": "string (ej: RNM, electromiografía)",
-                                "resultado": "string (texto del resultado)",
-                                "fecha": "string (fecha de la historia clínica)",
-                                "nombre_historia": "string (nombre de la historia clínica)"
-                            }
-                        ]
-                    }
-                    Sigue estas reglas:
-                    1. Para diagnósticos: combina diagnóstico + diagnóstico específico + lateralidad
-                    2. Para deficiencias: extrae nombre y porcentaje total
-                    3. Para entidad: identifica tipo (EPS/ARL/AFP) y nombre en mayúsculas
-                    4. Para conceptos médicos: 
-                       - Extrae la especialidad y el concepto completo
-                       - Extrae la fecha de la historia clínica
-                       - Extrae el nombre de la historia clínica
-                    5. Para pruebas específicas:
-                       - Extrae el tipo de prueba y su resultado
-                       - Extrae la fecha de la historia clínica
-                       - Extrae el nombre de la historia clínica
-                    6. Si algún campo no se encuentra, déjalo como null
-                    7. Si el diagnóstico contiene abreviaturas, como 'L4-L5', 'C3-C4', o similares, deben aparecer en mayúsculas."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae la información de la calificación en primera oportunidad del siguiente texto:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_first_opportunity_info"].messages(text),
             max_tokens=self.config.MAX_TOKENS
         )
-        return json.loads(response.choices[0].message.content)
 
     def generate_first_opportunity_template(self, info: Dict) -> str:
         """Genera la plantilla para la calificación en primera oportunidad"""
@@ -479,69 +490,12 @@ La {tipo_entidad} {info.get('nombre_entidad', '')} le calificó una Pérdida de
 
     def extract_first_opportunity_origin_info(self, text: str) -> Dict:
         """Extrae la información de determinación de origen en primera oportunidad"""
-        response = openai.ChatCompletion.create(
+        return self._chat_json(
+            "extract_first_opportunity_origin_info",
             model=self.config.CORRECTION_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Eres un especialista en extraer información de determinación de origen en primera oportunidad.
-                    Extrae la siguiente información en formato JSON:
-                    {
-                        "tipo_entidad": "string (debe ser exactamente 'EPS', 'ARL' o 'AFP')",
-                        "nombre_entidad": "string (en MAYÚSCULAS)",
-                        "diagnosticos": [
-                            {
-                                "nombre": "string (primera letra mayúscula, resto minúsculas)",
-                                "lateralidad": "string (solo si aparece textualmente: derecho, izquierdo, bilateral)",
-                                "origen": "string (debe ser exactamente 'Enfermedad común' o 'Enfermedad laboral')"
-                            }
-                        ],
-                        "conceptos_medicos": [
-                            {
-                                "especialidad": "string (ej: ortopedia, fisiatría)",
-                                "concepto": "string (texto del concepto)",
-                                "fecha": "string (fecha de la historia clínica)",
-                                "nombre_historia": "string (nombre de la historia clínica)"
-                            }
-                        ],
-                        "pruebas_especificas": [
-                            {
-                                "tipo": "string (ej: RNM, electromiografía)",
-                                "resultado": "string (texto del resultado)",
-                                "fecha": "string (fecha de la historia clínica)",
-                                "nombre_historia": "string (nombre de la historia clínica)"
-                            }
-                        ]
-                    }
-                    
-                    Reglas importantes:
-                    1. Para tipo_entidad: Identifica si es EPS, ARL o AFP basado en el texto
-                    2. Para nombre_entidad: Extrae SOLO el nombre en MAYÚSCULAS
-                    3. Para diagnósticos:
-                       - Búscalos en la sección de diagnósticos y en las conclusiones
-                       - Primera letra mayúscula, resto en minúsculas
-                       - Incluye lateralidad SOLO si aparece textualmente
-                       - El origen debe ser exactamente "Enfermedad común" o "Enfermedad laboral"
-                    4. Para conceptos médicos:
-                       - Extrae la especialidad y el concepto completo
-                       - Extrae la fecha de la historia clínica
-                       - Extrae el nombre de la historia clínica
-                       - Busca en secciones como "CONCEPTOS MÉDICOS" o "CONCEPTO DE ESPECIALISTA"
-                    5. Para pruebas específicas:
-                       - Extrae el tipo de prueba y su resultado
-                       - Extrae la fecha de la historia clínica
-                       - Extrae el nombre de la historia clínica
-                       - Busca en secciones como "PRUEBAS ESPECÍFICAS" o "EXÁMENES PARACLÍNICOS"
-                    6. Si no puedes identificar algún campo con certeza, déjalo como null"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Extrae la información de determinación de origen del siguiente texto:\n\n{text}"
-                }
-            ],
+            messages=PROMPTS["extract_first_opportunity_origin_info"].messages(text),
             max_tokens=self.config.MAX_TOKENS
         )
-        return json.loads(response.choices[0].message.content)
 
     def generate_first_opportunity_origin_template(self, info: Dict) -> str:
         """Genera la plantilla para la determinación de origen en primera oportunidad"""
@@ -616,12 +570,596 @@ La {tipo_entidad} {info['nombre_entidad']} calificó las patologías: {'; '.join
         
         return template
 
+class OCRQuality:
+    """Evaluación local (sin llamadas a la API) de la calidad del texto OCR de una página"""
+
+    # Palabras frecuentes en los dictámenes; se aceptan aunque no sigan el patrón ortográfico
+    LEXICON = frozenset("""
+        a al de del el la las lo los en y o u que se su sus por para con sin un una como es
+        no si ni le les fue son ha han ser este esta esto entre sobre segun según desde hasta
+        junta regional nacional calificacion calificación invalidez dictamen origen perdida pérdida
+        capacidad laboral comun común enfermedad accidente trabajo diagnostico diagnóstico
+        deficiencia deficiencias tabla rol ocupacional fecha estructuracion estructuración
+        paciente señor señora historia clinica clínica concepto conceptos medico médico prueba
+        pruebas recurso reposicion reposición eps arl afp pcl cie dx rnm emg tac
+    """.split())
+    ILLEGIBLE = re.compile(r"\[\s*(?:ilegible|illegible|no legible|inaudible|\?+)[^\]]*\]|\?{3,}|\ufffd", re.IGNORECASE)
+    TOKEN = re.compile(r"[^\W\d_]+", re.UNICODE)
+    VOWELS = set("aeiouáéíóúü")
+    CONSONANT_RUN = re.compile(r"[^aeiouáéíóúü]+")
+    # Únicos grupos de cuatro consonantes del español: instrucción, abstracto, transcripción, adscribir
+    CLUSTER_OF_FOUR = re.compile(r"[nbdr]s[tcpb][rl]")
+    TRIPLE_LETTER = re.compile(r"(.)\1\1")
+
+    @classmethod
+    def _is_word(cls, token: str) -> bool:
+        """Acepta tokens del léxico o que siguen un patrón ortográfico plausible en español"""
+        token = token.lower()
+        if token in cls.LEXICON or len(token) < 3:
+            return True
+        if not cls.VOWELS.intersection(token) or cls.TRIPLE_LETTER.search(token):
+            return False
+        for run in cls.CONSONANT_RUN.findall(token):
+            if len(run) > 4 or (len(run) == 4 and not cls.CLUSTER_OF_FOUR.fullmatch(run)):
+                return False
+        return True
+
+    @classmethod
+    def score(cls, text: str, ink: float, chars_per_ink: int) -> float:
+        """Puntaje entre 0 y 1: longitud frente a tinta, proporción de tokens no léxicos y marcas de ilegible"""
+        text = text or ""
+        if ink < 0.005:  # Página prácticamente en blanco
+            return 1.0
+        length_score = min(1.0, len(text.strip()) / (ink * chars_per_ink))
+        tokens = cls.TOKEN.findall(text)
+        word_score = sum(cls._is_word(t) for t in tokens) / len(tokens) if tokens else 0.0
+        markers = len(cls.ILLEGIBLE.findall(text))
+        return max(0.0, 0.5 * length_score + 0.5 * word_score - 0.1 * markers)
+
+class OCRPipeline:
+    """Pipeline por etapas para extraer el texto de un PDF.
+
+    La rasterización y la codificación se reparten por rangos de páginas en un pool de
+    procesos; el OCR y la corrección corren en un pool de hilos. Ambas etapas se conectan
+    con una cola acotada, de modo que el trabajo de CPU de las páginas siguientes se solapa
+    con las llamadas a la API de las anteriores sin acumular páginas sin límite.
+    """
+
+    _END = object()
+
+    STITCH_WINDOW = 20  # Líneas del borde de cada franja donde se busca el solapamiento
+    STITCH_SLACK = 1  # Líneas cortadas que puede haber entre el solapamiento y el borde de la franja
+    STITCH_MIN_CHARS = 16  # Letras y dígitos mínimos del solapamiento (evita unir por separadores o filas cortas)
+
+    def __init__(self, openai_service: OpenAIService, config: Config,
+                 render_pool: ProcessPoolExecutor, ocr_pool: ThreadPoolExecutor,
+                 tile_pool: Optional[ThreadPoolExecutor] = None):
+        self.openai_service = openai_service
+        self.config = config
+        self.render_pool = render_pool
+        self.ocr_pool = ocr_pool
+        self.tile_pool = tile_pool
+
+    def run(self, pdf_bytes: bytes, on_page: Optional[Callable[[int, int], None]] = None,
+            deadline: Optional[Deadline] = None) -> List[Optional[str]]:
+        """Retorna el texto corregido de cada página; on_page(completadas, total) reporta el avance.
+        Las páginas que fallan o que no terminan antes de deadline quedan como None."""
+        service = self.openai_service.with_deadline(deadline)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(pdf_bytes)
+        try:
+            total = pdf_workers.count_pages(tmp.name)
+            pages = queue.Queue(maxsize=self.config.PIPELINE_QUEUE_SIZE)
+            stop = threading.Event()
+            producer = threading.Thread(target=self._render_stage, args=(tmp.name, total, pages, stop), daemon=True)
+            producer.start()
+            try:
+                return self._ocr_stage(service, tmp.name, pages, total, on_page)
+            finally:
+                stop.set()
+                producer.join()
+        finally:
+            os.unlink(tmp.name)
+
+    @staticmethod
+    def _put(pages: queue.Queue, item, stop: threading.Event) -> bool:
+        """Encola respetando la contrapresión; retorna False si el pipeline se detuvo"""
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _render_stage(self, pdf_path: str, total: int, pages: queue.Queue, stop: threading.Event):
+        """Etapa productora: rasteriza y codifica rangos de páginas en el pool de procesos, en orden"""
+        in_flight = deque()
+        dpi = self.config.ADAPTIVE_LOW_DPI if self.config.ADAPTIVE_OCR else self.config.RENDER_DPI
+        try:
+            for first in range(1, total + 1, self.config.PAGES_PER_TASK):
+                last = min(first + self.config.PAGES_PER_TASK - 1, total)
+                in_flight.append((first, self.render_pool.submit(
+                    pdf_workers.render_pages, pdf_path, first, last, dpi
+                )))
+                if len(in_flight) >= self.config.RENDER_WORKERS and not self._emit(in_flight.popleft(), pages, stop):
+                    return
+            while in_flight:
+                if not self._emit(in_flight.popleft(), pages, stop):
+                    return
+            self._put(pages, self._END, stop)
+        except Exception as e:
+            self._put(pages, e, stop)
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+    def _emit(self, task, pages: queue.Queue, stop: threading.Event) -> bool:
+        """Espera un rango rasterizado y encola sus páginas como (índice, imagen base64, tinta).
+        La espera se interrumpe si el pipeline se detiene (p. ej. el rango está en cola detrás
+        de trabajos de otras sesiones en el pool compartido y se agotó el tiempo)."""
+        first, future = task
+        while not future.done():
+            if stop.is_set():
+                return False
+            wait([future], timeout=0.1)
+        for offset, (base64_img, ink) in enumerate(future.result()):
+            if not self._put(pages, (first - 1 + offset, base64_img, ink), stop):
+                return False
+        return True
+
+    @staticmethod
+    def _remaining(service: OpenAIService) -> Optional[float]:
+        """Tiempo restante del documento (None si no tiene presupuesto)"""
+        return service.deadline.remaining() if service.deadline else None
+
+    @property
+    def _tiling(self) -> bool:
+        return self.config.OCR_TILES > 1 and self.tile_pool is not None
+
+    @classmethod
+    def _find_seam(cls, tail: List[str], head: List[str]) -> Optional[Tuple[int, int]]:
+        """Busca el solapamiento entre el final de una franja y el inicio de la siguiente.
+        Solo se acepta si termina (salvo STITCH_SLACK líneas cortadas) en el borde inferior de tail,
+        empieza junto al borde superior de head y tiene contenido suficiente.
+        Retorna (líneas de tail a conservar, primera línea de head a conservar) o None."""
+        def normalize(line: str) -> str:
+            return " ".join(line.lower().split())
+
+        # Las líneas en blanco no cuentan: el OCR de cada franja puede agregarlas u omitirlas
+        a = [(i, normalize(line)) for i, line in enumerate(tail) if line.strip()]
+        b = [(j, normalize(line)) for j, line in enumerate(head) if line.strip()]
+        best = None
+        for cut_tail in range(min(cls.STITCH_SLACK, len(a)) + 1):
+            end = len(a) - cut_tail
+            for cut_head in range(min(cls.STITCH_SLACK, len(b)) + 1):
+                for size in range(min(end, len(b) - cut_head), 0, -1):
+                    if best and size <= best[0]:
+                        break
+                    if [l for _, l in a[end - size:end]] != [l for _, l in b[cut_head:cut_head + size]]:
+                        continue
+                    if sum(ch.isalnum() for _, l in a[end - size:end] for ch in l) >= cls.STITCH_MIN_CHARS:
+                        best = (size, a[end - 1][0] + 1, b[cut_head + size - 1][0] + 1)
+                    break
+        return best[1:] if best else None
+
+    @classmethod
+    def _stitch_bands(cls, texts: List[str]) -> str:
+        """Une el texto de franjas consecutivas eliminando las líneas repetidas por el solapamiento.
+        Las líneas cortadas en el borde de una franja se descartan en favor de la franja vecina;
+        si no se encuentra un solapamiento confiable, las franjas se unen sin descartar nada."""
+        lines = texts[0].splitlines() if texts else []
+        for text in texts[1:]:
+            next_lines = text.splitlines()
+            tail = lines[-cls.STITCH_WINDOW:]
+            seam = cls._find_seam(tail, next_lines[:cls.STITCH_WINDOW])
+            if seam:
+                keep_tail, skip_head = seam
+                lines = lines[:len(lines) - len(tail) + keep_tail] + next_lines[skip_head:]
+            else:
+                lines += next_lines
+        return "\n".join(lines)
+
+    def _ocr_tiled(self, service: OpenAIService, pdf_path: str, index: int, dpi: int) -> str:
+        """OCR de una página por franjas horizontales solapadas, en paralelo"""
+        bands = self.render_pool.submit(
+            pdf_workers.render_bands, pdf_path, index + 1, dpi, self.config.OCR_TILES, self.config.TILE_OVERLAP
+        ).result(timeout=self._remaining(service))
+        futures = [self.tile_pool.submit(service.extract_text_from_image, band) for band in bands]
+        try:
+            return self._stitch_bands([future.result(timeout=self._remaining(service)) for future in futures])
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _ocr_page(self, service: OpenAIService, pdf_path: str, index: int, base64_img: str, ink: float) -> str:
+        """Extrae y corrige el texto de una página; en modo adaptativo, repite en alta
+        resolución solo si el texto obtenido tiene un puntaje de calidad bajo.
+        Con OCR_TILES, las páginas densas (y los reintentos) se procesan por franjas."""
+        if self._tiling and ink >= self.config.TILE_MIN_INK:
+            texto_pagina = self._ocr_tiled(service, pdf_path, index, self.config.TILE_DPI)
+        else:
+            texto_pagina = service.extract_text_from_image(base64_img)
+        if self.config.ADAPTIVE_OCR:
+            score = OCRQuality.score(texto_pagina, ink, self.config.OCR_CHARS_PER_INK)
+            if score < self.config.OCR_RETRY_THRESHOLD:
+                try:
+                    if self._tiling:
+                        texto_hd, ink_hd = self._ocr_tiled(service, pdf_path, index, self.config.ADAPTIVE_HIGH_DPI), ink
+                    else:
+                        [(base64_hd, ink_hd)] = self.render_pool.submit(
+                            pdf_workers.render_pages, pdf_path, index + 1, index + 1, self.config.ADAPTIVE_HIGH_DPI
+                        ).result(timeout=self._remaining(service))
+                        texto_hd = service.extract_text_from_image(base64_hd)
+                    if OCRQuality.score(texto_hd, ink_hd, self.config.OCR_CHARS_PER_INK) >= score:
+                        texto_pagina = texto_hd
+                except Exception:
+                    pass  # El reintento es opcional: se conserva el texto de baja resolución
+        return service.correct_text(texto_pagina)
+
+    def _ocr_stage(self, service: OpenAIService, pdf_path: str, pages: queue.Queue, total: int,
+                   on_page: Optional[Callable[[int, int], None]]) -> List[Optional[str]]:
+        """Etapa consumidora: OCR concurrente (acotado por OCR_WORKERS) en el hilo que llama.
+        Al agotarse el tiempo se cancelan las páginas pendientes y se retorna lo completado."""
+        results = [None] * total
+        pending = {}
+        exhausted = False
+        completed = 0
+        try:
+            while True:
+                while not exhausted and len(pending) < self.config.OCR_WORKERS:
+                    try:
+                        item = pages.get(timeout=self._remaining(service))
+                    except queue.Empty:
+                        return results
+                    if item is self._END or isinstance(item, Exception):
+                        # Un error de rasterización deja sin procesar las páginas restantes
+                        exhausted = True
+                    else:
+                        index = item[0]
+                        pending[self.ocr_pool.submit(self._ocr_page, service, pdf_path, *item)] = index
+                if not pending:
+                    return results
+                done, _ = wait(pending, timeout=self._remaining(service), return_when=FIRST_COMPLETED)
+                if not done:
+                    return results
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except Exception:
+                        results[index] = None
+                    completed += 1
+                    if on_page:
+                        on_page(completed, total)
+        finally:
+            for future in pending:
+                future.cancel()
+
+class CaseStore:
+    """Base local (SQLite + FTS5) de dictámenes ya procesados"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documentos (
+            documento TEXT PRIMARY KEY,
+            nombre TEXT,
+            num_paginas INTEGER,
+            creado TEXT
+        );
+        CREATE TABLE IF NOT EXISTS paginas (
+            documento TEXT,
+            numero INTEGER,
+            texto TEXT,
+            PRIMARY KEY (documento, numero)
+        );
+        CREATE TABLE IF NOT EXISTS casos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            documento TEXT,
+            tipo TEXT,
+            numero_dictamen TEXT,
+            entidad TEXT,
+            persona TEXT,
+            fecha TEXT,
+            campos TEXT,
+            plantilla TEXT,
+            creado TEXT,
+            UNIQUE (documento, tipo)
+        );
+        CREATE INDEX IF NOT EXISTS idx_casos_numero ON casos (numero_dictamen);
+        CREATE INDEX IF NOT EXISTS idx_casos_fecha ON casos (fecha);
+        CREATE VIRTUAL TABLE IF NOT EXISTS indice USING fts5(
+            documento UNINDEXED,
+            origen UNINDEXED,
+            texto,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Abre una conexión nueva por operación; cada sesión de Streamlit corre en su propio hilo"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def document_id(pdf_bytes: bytes) -> str:
+        """Identificador estable de un PDF (hash de su contenido)"""
+        return hashlib.sha256(pdf_bytes).hexdigest()
+
+    def get_pages(self, documento: str) -> Optional[List[str]]:
+        """Retorna el texto OCR almacenado por página, o None si el documento no se ha procesado"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT texto FROM paginas WHERE documento = ? ORDER BY numero", (documento,)
+            ).fetchall()
+        return [row["texto"] for row in rows] or None
+
+    def save_pages(self, documento: str, nombre: str, paginas: List[str]):
+        """Guarda el texto OCR de cada página y lo indexa para búsqueda de texto completo"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documentos (documento, nombre, num_paginas, creado) VALUES (?, ?, ?, ?)",
+                (documento, nombre, len(paginas), datetime.now().isoformat(timespec="seconds"))
+            )
+            conn.execute("DELETE FROM paginas WHERE documento = ?", (documento,))
+            conn.execute("DELETE FROM indice WHERE documento = ? AND origen LIKE 'pagina %'", (documento,))
+            conn.executemany(
+                "INSERT INTO paginas (documento, numero, texto) VALUES (?, ?, ?)",
+                [(documento, i + 1, texto) for i, texto in enumerate(paginas)]
+            )
+            conn.executemany(
+                "INSERT INTO indice (documento, origen, texto) VALUES (?, ?, ?)",
+                [(documento, f"pagina {i + 1}", texto) for i, texto in enumerate(paginas)]
+            )
+
+    def save_case(self, documento: str, tipo: str, campos: Dict, plantilla: str,
+                  numero_dictamen: Optional[str] = None, entidad: Optional[str] = None,
+                  persona: Optional[str] = None, fecha: Optional[str] = None) -> int:
+        """Guarda los campos extraídos (por método extract_*) y la plantilla generada.
+        Un documento tiene un solo caso por tipo: volver a procesarlo reemplaza el anterior."""
+        origen = f"plantilla {tipo}"
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """INSERT INTO casos (documento, tipo, numero_dictamen, entidad, persona, fecha, campos, plantilla, creado)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (documento, tipo) DO UPDATE SET
+                       numero_dictamen = excluded.numero_dictamen, entidad = excluded.entidad,
+                       persona = excluded.persona, fecha = excluded.fecha, campos = excluded.campos,
+                       plantilla = excluded.plantilla, creado = excluded.creado""",
+                (documento, tipo, numero_dictamen, entidad, persona, fecha,
+                 json.dumps(campos, ensure_ascii=False), plantilla,
+                 datetime.now().isoformat(timespec="seconds"))
+            )
+            conn.execute("DELETE FROM indice WHERE documento = ? AND origen = ?", (documento, origen))
+            conn.execute(
+                "INSERT INTO indice (documento, origen, texto) VALUES (?, ?, ?)",
+                (documento, origen, plantilla)
+            )
+            return conn.execute(
+                "SELECT id FROM casos WHERE documento = ? AND tipo = ?", (documento, tipo)
+            ).fetchone()["id"]
+
+    @staticmethod
+    def _fts_query(texto: str) -> str:
+        """Convierte texto libre en una consulta FTS5 segura (todas las palabras, como frases)"""
+        return " ".join('"{}"'.format(palabra.replace('"', '""')) for palabra in texto.split())
+
+    def search(self, texto: Optional[str] = None, numero_dictamen: Optional[str] = None,
+               entidad: Optional[str] = None, persona: Optional[str] = None,
+               fecha: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Busca casos por texto completo y/o por número de dictamen, entidad, persona o fecha.
+        El número de dictamen y la fecha se buscan exactos (por índice); la entidad y la persona,
+        por contenido parcial sin distinguir mayúsculas."""
+        condiciones, parametros = [], []
+        if texto and texto.strip():
+            condiciones.append("c.documento IN (SELECT documento FROM indice WHERE indice MATCH ?)")
+            parametros.append(self._fts_query(texto))
+        for columna, valor in (("numero_dictamen", numero_dictamen), ("fecha", fecha)):
+            if valor and valor.strip():
+                condiciones.append(f"c.{columna} = ?")
+                parametros.append(valor.strip())
+        for columna, valor in (("entidad", entidad), ("persona", persona)):
+            if valor and valor.strip():
+                condiciones.append(f"c.{columna} LIKE ?")
+                parametros.append(f"%{valor.strip()}%")
+
+        sql = """SELECT c.*, d.nombre, d.num_paginas FROM casos c
+                 LEFT JOIN documentos d ON d.documento = c.documento"""
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += " ORDER BY c.creado DESC, c.id DESC LIMIT ?"
+        parametros.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, parametros).fetchall()
+        resultados = []
+        for row in rows:
+            caso = dict(row)
+            caso["campos"] = json.loads(caso["campos"]) if caso["campos"] else {}
+            resultados.append(caso)
+        return resultados
+
+class DocumentService:
+    """Flujos completos de procesamiento por tipo de documento, independientes de la interfaz
+    (los usan tanto la aplicación de Streamlit como el servicio HTTP)"""
+
+    TIPOS = ("primera_oportunidad_pcl", "junta_regional_pcl", "recurso_reposicion", "primera_oportunidad_origen")
+
+    def __init__(self, openai_service: OpenAIService, case_store: CaseStore, ocr_pipeline: Optional[OCRPipeline]):
+        self.openai_service = openai_service
+        self.case_store = case_store
+        self.ocr_pipeline = ocr_pipeline
+
+    MISSING_PAGE = "[Página no procesada: se agotó el tiempo o falló la extracción]"
+
+    @classmethod
+    def join_pages(cls, paginas: List[Optional[str]]) -> str:
+        """Une el texto de las páginas en un solo texto con encabezados de página"""
+        return "".join(
+            f"\n\nPágina {i+1}:\n{cls.MISSING_PAGE if texto is None else texto}" for i, texto in enumerate(paginas)
+        )
+
+    def extract_pages(self, pdf_bytes: bytes, nombre: str = "",
+                      on_page: Optional[Callable[[int, int], None]] = None,
+                      deadline: Optional[Deadline] = None) -> Tuple[List[Optional[str]], bool]:
+        """Retorna el texto de cada página (None si falta) y si se reutilizó el texto almacenado
+        de un procesamiento anterior. Solo se guardan en la base local los documentos completos."""
+        documento = CaseStore.document_id(pdf_bytes)
+        paginas = self.case_store.get_pages(documento)
+        if paginas:
+            return paginas, True
+        paginas = self.ocr_pipeline.run(pdf_bytes, on_page=on_page, deadline=deadline)
+        if all(texto is None for texto in paginas):
+            raise RuntimeError("No se pudo extraer el texto de ninguna página")
+        if None not in paginas:
+            self.case_store.save_pages(documento, nombre, paginas)
+        return paginas, False
+
+    def process(self, tipo: str, pdf_bytes: bytes, nombre: str = "",
+                on_page: Optional[Callable[[int, int], None]] = None,
+                budget_seconds: Optional[float] = None) -> Dict:
+        """Procesa un PDF completo (OCR, extracción y plantilla) dentro de un presupuesto de tiempo.
+
+        Si se agota el tiempo o falla alguna página o extracción, retorna el resultado parcial
+        con las páginas y campos faltantes marcados; solo los casos completos se guardan."""
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de documento no soportado: {tipo}")
+        config = self.openai_service.config
+        deadline = Deadline(budget_seconds or config.DOCUMENT_BUDGET_SECONDS)
+        documento = CaseStore.document_id(pdf_bytes)
+
+        paginas, reutilizado = self.extract_pages(pdf_bytes, nombre, on_page, deadline.share(config.OCR_BUDGET_SHARE))
+        paginas_faltantes = [i + 1 for i, texto in enumerate(paginas) if texto is None]
+
+        service = self.openai_service.with_deadline(deadline)
+        campos, plantilla, claves, campos_faltantes = self.extract(tipo, self.join_pages(paginas), service)
+
+        completo = not paginas_faltantes and not campos_faltantes
+        if completo:
+            caso_id = self.case_store.save_case(documento, tipo, campos, plantilla, **claves)
+        else:
+            caso_id = None
+            plantilla = self.incomplete_notice(paginas_faltantes, campos_faltantes) + "\n\n" + plantilla
+        return {
+            "caso_id": caso_id,
+            "tipo": tipo,
+            "documento": documento,
+            "num_paginas": len(paginas),
+            "texto_reutilizado": reutilizado,
+            "completo": completo,
+            "paginas_faltantes": paginas_faltantes,
+            "campos_faltantes": campos_faltantes,
+            "campos": campos,
+            "plantilla": plantilla,
+            "paginas": [self.MISSING_PAGE if texto is None else texto for texto in paginas]
+        }
+
+    def extract(self, tipo: str, texto: str,
+                service: Optional[OpenAIService] = None) -> Tuple[Dict, str, Dict, List[str]]:
+        """Extrae los campos del texto y genera la plantilla del tipo indicado.
+        Retorna (campos, plantilla, claves de búsqueda, campos faltantes)."""
+        campos_faltantes = []
+        campos, plantilla, claves = getattr(self, f"_process_{tipo}")(
+            service or self.openai_service, texto, campos_faltantes
+        )
+        return campos, plantilla, claves, campos_faltantes
+
+    @staticmethod
+    def incomplete_notice(paginas_faltantes: List[int], campos_faltantes: List[str]) -> str:
+        """Marca visible al inicio de una plantilla generada con información incompleta"""
+        partes = []
+        if paginas_faltantes:
+            partes.append("páginas sin procesar: " + ", ".join(str(p) for p in paginas_faltantes))
+        if campos_faltantes:
+            partes.append("información no extraída: " + ", ".join(campos_faltantes))
+        return f"[RESULTADO PARCIAL - {'; '.join(partes)}]"
+
+    @staticmethod
+    def _call(campos_faltantes: List[str], operation: str, func: Callable, *args, default=None):
+        """Ejecuta una extracción; si falla o se agota el tiempo, registra el campo como faltante"""
+        try:
+            return func(*args)
+        except Exception:
+            campos_faltantes.append(operation)
+            return default
+
+    def _process_primera_oportunidad_pcl(self, service: OpenAIService, texto: str,
+                                         faltantes: List[str]) -> Tuple[Dict, str, Dict]:
+        info = self._call(faltantes, "extract_first_opportunity_info",
+                          service.extract_first_opportunity_info, texto, default={})
+        template = service.generate_first_opportunity_template(info)
+        claves = {"entidad": info.get("nombre_entidad"), "fecha": info.get("fecha_estructuracion")}
+        return {"extract_first_opportunity_info": info}, template, claves
+
+    def _process_junta_regional_pcl(self, service: OpenAIService, texto: str,
+                                    faltantes: List[str]) -> Tuple[Dict, str, Dict]:
+        pcl_info = self._call(faltantes, "extract_pcl_info", service.extract_pcl_info, texto, default={})
+        template = service.generate_pcl_template(pcl_info)
+        claves = {
+            "numero_dictamen": pcl_info.get("numero_dictamen"),
+            "entidad": pcl_info.get("ubicacion"),
+            "fecha": pcl_info.get("fecha_dictamen")
+        }
+        return {"extract_pcl_info": pcl_info}, template, claves
+
+    def _process_recurso_reposicion(self, service: OpenAIService, texto: str,
+                                    faltantes: List[str]) -> Tuple[Dict, str, Dict]:
+        texto_procesado = self._call(faltantes, "process_recurring_text", service.process_recurring_text, texto)
+        if texto_procesado is None:
+            # Sin el texto procesado no hay de dónde extraer la entidad
+            faltantes.append("extract_recurring_entity")
+            texto_procesado, entity = "[Texto del recurso no procesado]", "[Entidad no identificada]"
+        else:
+            entity = self._call(faltantes, "extract_recurring_entity", service.extract_recurring_entity,
+                                texto_procesado, default="[Entidad no identificada]")
+        template = service.generate_recurring_template(entity, texto_procesado)
+        campos = {"process_recurring_text": texto_procesado, "extract_recurring_entity": entity}
+        return campos, template, {"persona": entity}
+
+    def _process_primera_oportunidad_origen(self, service: OpenAIService, texto: str,
+                                            faltantes: List[str]) -> Tuple[Dict, str, Dict]:
+        info = self._call(faltantes, "extract_first_opportunity_origin_info",
+                          service.extract_first_opportunity_origin_info, texto, default={})
+        template = service.generate_first_opportunity_origin_template(info)
+        return {"extract_first_opportunity_origin_info": info}, template, {"entidad": info.get("nombre_entidad")}
+
+def timed_fragment(name: str):
+    """Mide cada ejecución de un método de StreamlitUI decorado con st.fragment (se aplica debajo
+    de @st.fragment). Las recargas de un fragmento no pasan por main(), así que se registran aquí."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                timings = get_run_timings()
+                timings.record_fragment(name, time.perf_counter() - inicio)
+                if self.document_service.openai_service.config.SHOW_TIMINGS:
+                    st.caption(f"{name}: " + " · ".join(
+                        f"{nombre}: {valor}" for nombre, valor in timings.fragment_summary(name).items()
+                    ))
+        return wrapper
+    return decorator
+
 class StreamlitUI:
     """Clase para manejar la interfaz de usuario de Streamlit"""
-    
-    def __init__(self, pdf_processor: PDFProcessor, openai_service: OpenAIService):
-        self.pdf_processor = pdf_processor
-        self.openai_service = openai_service
+
+    def __init__(self, document_service: DocumentService):
+        self.document_service = document_service
+        self.case_store = document_service.case_store
     
     def render(self):
         """Renderiza la interfaz de usuario"""
@@ -634,237 +1172,373 @@ class StreamlitUI:
             )
 
             # Crear menú horizontal superior
-            tab_pcl, tab_origen = st.tabs([
+            tab_pcl, tab_origen, tab_buscar = st.tabs([
                 "📊 Dictamen Pérdida de Capacidad Laboral (PCL)",
-                "🏥 Dictamen Determinación de Origen"
+                "🏥 Dictamen Determinación de Origen",
+                "🔎 Buscar Dictámenes"
             ])
             
             with tab_pcl:
-                # Menú de opciones usando option_menu para PCL
-                tipo_documento = option_menu(
-                    menu_title=None,
-                    options=["Primera Oportunidad", "Dictamen Junta Regional", "Recurso de Reposición"],
-                    icons=["file-earmark-text", "clipboard2-check", "balance-scale"],
-                    default_index=0,
-                    orientation="horizontal",
-                    key="menu_pcl",
-                    styles={
-                        "container": {"padding": "0px", "background-color": "#fafafa"},
-                        "icon": {"color": "black", "font-size": "14px"},
-                        "nav-link": {
-                            "font-size": "18px",
-                            "text-align": "center",
-                            "margin": "0px",
-                            "--hover-color": "#eee",
-                            "color": "black"
-                        },
-                        "nav-link-selected": {
-                            "background-color": "#ff4b6a",
-                            "color": "white"
-                        },
-                    }
-                )
-                
-                # Área principal de procesamiento
-                if tipo_documento == "Primera Oportunidad":
-                    st.markdown("### 📝 Procesamiento de Calificación en Primera Oportunidad")
-                    uploaded_file_po = st.file_uploader("Sube el documento de Calificación en Primera Oportunidad", type=["pdf"], key="first_opportunity")
-                    if uploaded_file_po:
-                        if st.button("Procesar Documento", type="primary", key="btn_first_opportunity"):
-                            with st.spinner("Procesando documento..."):
-                                try:
-                                    # Procesar el PDF
-                                    texto_completo = self._process_pdf(uploaded_file_po, show_images=False)
-                                    
-                                    # Extraer información
-                                    with st.spinner("Extrayendo información..."):
-                                        info = self.openai_service.extract_first_opportunity_info(texto_completo)
-                                    
-                                    # Generar plantilla
-                                    template = self.openai_service.generate_first_opportunity_template(info)
-                                    
-                                    # Mostrar resultado
-                                    st.success("¡Plantilla generada exitosamente!")
-                                    st.text_area("", template, height=400, key="first_opportunity_result")
-                                    
-                                    # Opción para copiar
-                                    if st.button("Copiar al Portapapeles", key="btn_copy_first_opportunity"):
-                                        st.write("Texto copiado al portapapeles")
-                                        st.code(template, language=None)
-                                        
-                                except Exception as e:
-                                    st.error("El documento no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
-                    else:
-                        st.info("Sube el documento de Calificación en Primera Oportunidad")
-                
-                elif tipo_documento == "Dictamen Junta Regional":
-                    st.markdown("### 📋 Procesamiento de Dictamen de Junta Regional")
-                    uploaded_file_junta = st.file_uploader("Sube el dictamen de Junta Regional de Calificación", type=["pdf"], key="junta_template")
-                    if uploaded_file_junta:
-                        if st.button("Procesar Dictamen", type="primary", key="btn_acta"):
-                            with st.spinner("Procesando dictamen para generar plantilla..."):
-                                try:
-                                    # Procesar el PDF sin mostrar imágenes
-                                    texto_completo = self._process_pdf(uploaded_file_junta, show_images=False)
-                                    
-                                    # Extraer información PCL
-                                    with st.spinner("Extrayendo información del dictamen PCL..."):
-                                        pcl_info = self.openai_service.extract_pcl_info(texto_completo)
-                                    
-                                    # Generar plantilla PCL
-                                    template = self.openai_service.generate_pcl_template(pcl_info)
-                                    
-                                    # Mostrar resultado
-                                    st.success("¡Plantilla generada exitosamente!")
-                                    st.text_area("", template, height=400, key="acta_result")
-                                    
-                                    # Opción para copiar
-                                    if st.button("Copiar Dictamen", key="btn_copy_acta"):
-                                        st.write("Texto copiado al portapapeles")
-                                        st.code(template, language=None)
-                                        
-                                except Exception as e:
-                                    st.error("El documento no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
-                    else:
-                        st.info("Sube el Dictamen de Junta Regional de Calificación")
-                
-                else:  # Recurso de Reposición
-                    st.markdown("### ⚖️ Procesamiento de Recurso de Reposición")
-                    uploaded_recurring = st.file_uploader("Sube el recurso de reposición", type=["pdf"], key="recurring_template_standalone")
-                    if uploaded_recurring:
-                        if st.button("Procesar Recurso", type="primary", key="btn_recurring_standalone"):
-                            with st.spinner("Procesando recurso de reposición..."):
-                                try:
-                                    # Procesar el PDF del recurso
-                                    texto_recurring = self._process_pdf(uploaded_recurring, show_images=False)
-                                    
-                                    # Procesar el texto del recurso
-                                    texto_procesado = self.openai_service.process_recurring_text(texto_recurring)
-                                    
-                                    # Extraer entidad que presenta el recurso
-                                    entity = self.openai_service.extract_recurring_entity(texto_procesado)
-                                    
-                                    # Generar plantilla del recurso
-                                    recurring_template = self.openai_service.generate_recurring_template(entity, texto_procesado)
-                                    
-                                    # Mostrar resultado del recurso
-                                    st.success("¡Recurso de reposición procesado exitosamente!")
-                                    st.text_area("", recurring_template, height=400, key="recurring_result_standalone")
-                                    
-                                    # Opción para copiar
-                                    if st.button("Copiar al Portapapeles", key="btn_copy_recurring_standalone"):
-                                        st.write("Texto copiado al portapapeles")
-                                        st.code(recurring_template, language=None)
-                                        
-                                except Exception as e:
-                                    st.error("El recurso de reposición no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
-                    else:
-                        st.info("Sube el recurso de reposición")
-            
+                self._render_pcl_tab()
+
             with tab_origen:
-                # Menú de opciones usando option_menu para Origen
-                tipo_documento_origen = option_menu(
-                    menu_title=None,
-                    options=["Primera Oportunidad", "Dictamen Junta Regional", "Recurso de Reposición"],
-                    icons=["file-earmark-text", "clipboard2-check", "balance-scale"],
-                    default_index=0,
-                    orientation="horizontal",
-                    key="menu_origen",
-                    styles={
-                        "container": {"padding": "0px", "background-color": "#fafafa"},
-                        "icon": {"color": "black", "font-size": "14px"},
-                        "nav-link": {
-                            "font-size": "18px",
-                            "text-align": "center",
-                            "margin": "0px",
-                            "--hover-color": "#eee",
-                            "color": "black"
-                        },
-                        "nav-link-selected": {
-                            "background-color": "#135029",
-                            "color": "white"
-                        },
-                    }
-                )
-                
-                if tipo_documento_origen == "Primera Oportunidad":
-                    st.markdown("### 📝 Determinación de Origen en Primera Oportunidad")
-                    uploaded_file_origen = st.file_uploader("Sube el documento de Determinación de Origen", type=["pdf"], key="first_opportunity_origin")
-                    if uploaded_file_origen:
-                        if st.button("Procesar Documento", type="primary", key="btn_first_opportunity_origin"):
-                            with st.spinner("Procesando documento..."):
-                                try:
-                                    # Procesar el PDF
-                                    texto_completo = self._process_pdf(uploaded_file_origen, show_images=False)
-                                    
-                                    # Extraer información
-                                    with st.spinner("Extrayendo información..."):
-                                        info = self.openai_service.extract_first_opportunity_origin_info(texto_completo)
-                                    
-                                    # Generar plantilla
-                                    template = self.openai_service.generate_first_opportunity_origin_template(info)
-                                    
-                                    # Mostrar resultado
-                                    st.success("¡Plantilla generada exitosamente!")
-                                    st.text_area("", template, height=400, key="first_opportunity_origin_result")
-                                    
-                                    # Opción para copiar
-                                    if st.button("Copiar al Portapapeles", key="btn_copy_first_opportunity_origin"):
-                                        st.write("Texto copiado al portapapeles")
-                                        st.code(template, language=None)
-                                        
-                                except Exception as e:
-                                    st.error("El documento no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
-                    else:
-                        st.info("Sube el documento de Determinación de Origen")
-                
-                elif tipo_documento_origen == "Dictamen Junta Regional":
-                    st.markdown("### 📋 Dictamen de Junta Regional")
-                    st.info("Funcionalidad en desarrollo")
-                
-                else:  # Recurso de Reposición
-                    st.markdown("### ⚖️ Recurso de Reposición")
-                    st.info("Funcionalidad en desarrollo")
+                self._render_origen_tab()
+
+            with tab_buscar:
+                self._render_search()
 
         except Exception as e:
             st.error(f"Se produjo un error inesperado. Por favor, recarga la página. Error: {str(e)}")
             st.stop()
 
-    def _process_pdf(self, uploaded_file, show_images: bool = False) -> str:
-        """Procesa el PDF subido y retorna el texto completo"""
-        try:
-            # Convertir PDF a imágenes
-            images = self.pdf_processor.convert_pdf_to_images(uploaded_file.read())
-            texto_completo = ""
-            
-            # Procesar cada página
-            progress_bar = st.progress(0)
-            for i, image in enumerate(images):
-                # Actualizar barra de progreso
-                progress = (i + 1) / len(images)
-                progress_bar.progress(progress)
-                
-                # Extraer y corregir texto de la página
-                with st.spinner(f'Procesando página {i+1} de {len(images)}...'):
-                    base64_img = self.pdf_processor.image_to_base64(image)
-                    texto_pagina = self.openai_service.extract_text_from_image(base64_img)
-                    texto_corregido = self.openai_service.correct_text(texto_pagina)
-                    texto_completo += f"\n\nPágina {i+1}:\n{texto_corregido}"
-            
-            progress_bar.empty()
-            return texto_completo
-            
-        except Exception as e:
-            st.error(f"Error al procesar el PDF: {str(e)}")
-            return ""
+    @st.fragment
+    @timed_fragment("pestaña_pcl")
+    def _render_pcl_tab(self):
+        """Renderiza la pestaña de dictámenes PCL (como fragmento: sus interacciones no recargan toda la página)"""
+        # Menú de opciones usando option_menu para PCL
+        tipo_documento = option_menu(
+            menu_title=None,
+            options=["Primera Oportunidad", "Dictamen Junta Regional", "Recurso de Reposición"],
+            icons=["file-earmark-text", "clipboard2-check", "balance-scale"],
+            default_index=0,
+            orientation="horizontal",
+            key="menu_pcl",
+            styles={
+                "container": {"padding": "0px", "background-color": "#fafafa"},
+                "icon": {"color": "black", "font-size": "14px"},
+                "nav-link": {
+                    "font-size": "18px",
+                    "text-align": "center",
+                    "margin": "0px",
+                    "--hover-color": "#eee",
+                    "color": "black"
+                },
+                "nav-link-selected": {
+                    "background-color": "#ff4b6a",
+                    "color": "white"
+                },
+            }
+        )
+        
+        # Área principal de procesamiento
+        if tipo_documento == "Primera Oportunidad":
+            st.markdown("### 📝 Procesamiento de Calificación en Primera Oportunidad")
+            uploaded_file_po = st.file_uploader("Sube el documento de Calificación en Primera Oportunidad", type=["pdf"], key="first_opportunity")
+            if uploaded_file_po:
+                if st.button("Procesar Documento", type="primary", key="btn_first_opportunity"):
+                    with st.spinner("Procesando documento..."):
+                        try:
+                            # Procesar el PDF, extraer información y generar plantilla
+                            template = self._process_document("primera_oportunidad_pcl", uploaded_file_po)["plantilla"]
+                            
+                            # Mostrar resultado
+                            st.text_area("", template, height=400, key="first_opportunity_result")
+                            
+                            # Opción para copiar
+                            if st.button("Copiar al Portapapeles", key="btn_copy_first_opportunity"):
+                                st.write("Texto copiado al portapapeles")
+                                st.code(template, language=None)
+                                
+                        except Exception as e:
+                            st.error("El documento no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
+            else:
+                st.info("Sube el documento de Calificación en Primera Oportunidad")
+        
+        elif tipo_documento == "Dictamen Junta Regional":
+            st.markdown("### 📋 Procesamiento de Dictamen de Junta Regional")
+            uploaded_file_junta = st.file_uploader("Sube el dictamen de Junta Regional de Calificación", type=["pdf"], key="junta_template")
+            if uploaded_file_junta:
+                if st.button("Procesar Dictamen", type="primary", key="btn_acta"):
+                    with st.spinner("Procesando dictamen para generar plantilla..."):
+                        try:
+                            # Procesar el PDF, extraer información PCL y generar plantilla
+                            template = self._process_document("junta_regional_pcl", uploaded_file_junta)["plantilla"]
+                            
+                            # Mostrar resultado
+                            st.text_area("", template, height=400, key="acta_result")
+                            
+                            # Opción para copiar
+                            if st.button("Copiar Dictamen", key="btn_copy_acta"):
+                                st.write("Texto copiado al portapapeles")
+                                st.code(template, language=None)
+                                
+                        except Exception as e:
+                            st.error("El documento no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
+            else:
+                st.info("Sube el Dictamen de Junta Regional de Calificación")
+        
+        else:  # Recurso de Reposición
+            st.markdown("### ⚖️ Procesamiento de Recurso de Reposición")
+            uploaded_recurring = st.file_uploader("Sube el recurso de reposición", type=["pdf"], key="recurring_template_standalone")
+            if uploaded_recurring:
+                if st.button("Procesar Recurso", type="primary", key="btn_recurring_standalone"):
+                    with st.spinner("Procesando recurso de reposición..."):
+                        try:
+                            # Procesar el PDF del recurso, extraer quién lo presenta y generar plantilla
+                            recurring_template = self._process_document(
+                                "recurso_reposicion", uploaded_recurring, "¡Recurso de reposición procesado exitosamente!"
+                            )["plantilla"]
+                            
+                            # Mostrar resultado del recurso
+                            st.text_area("", recurring_template, height=400, key="recurring_result_standalone")
+                            
+                            # Opción para copiar
+                            if st.button("Copiar al Portapapeles", key="btn_copy_recurring_standalone"):
+                                st.write("Texto copiado al portapapeles")
+                                st.code(recurring_template, language=None)
+                                
+                        except Exception as e:
+                            st.error("El recurso de reposición no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
+            else:
+                st.info("Sube el recurso de reposición")
+
+    @st.fragment
+    @timed_fragment("pestaña_origen")
+    def _render_origen_tab(self):
+        """Renderiza la pestaña de determinación de origen (como fragmento)"""
+        # Menú de opciones usando option_menu para Origen
+        tipo_documento_origen = option_menu(
+            menu_title=None,
+            options=["Primera Oportunidad", "Dictamen Junta Regional", "Recurso de Reposición"],
+            icons=["file-earmark-text", "clipboard2-check", "balance-scale"],
+            default_index=0,
+            orientation="horizontal",
+            key="menu_origen",
+            styles={
+                "container": {"padding": "0px", "background-color": "#fafafa"},
+                "icon": {"color": "black", "font-size": "14px"},
+                "nav-link": {
+                    "font-size": "18px",
+                    "text-align": "center",
+                    "margin": "0px",
+                    "--hover-color": "#eee",
+                    "color": "black"
+                },
+                "nav-link-selected": {
+                    "background-color": "#135029",
+                    "color": "white"
+                },
+            }
+        )
+        
+        if tipo_documento_origen == "Primera Oportunidad":
+            st.markdown("### 📝 Determinación de Origen en Primera Oportunidad")
+            uploaded_file_origen = st.file_uploader("Sube el documento de Determinación de Origen", type=["pdf"], key="first_opportunity_origin")
+            if uploaded_file_origen:
+                if st.button("Procesar Documento", type="primary", key="btn_first_opportunity_origin"):
+                    with st.spinner("Procesando documento..."):
+                        try:
+                            # Procesar el PDF, extraer información y generar plantilla
+                            template = self._process_document("primera_oportunidad_origen", uploaded_file_origen)["plantilla"]
+                            
+                            # Mostrar resultado
+                            st.text_area("", template, height=400, key="first_opportunity_origin_result")
+                            
+                            # Opción para copiar
+                            if st.button("Copiar al Portapapeles", key="btn_copy_first_opportunity_origin"):
+                                st.write("Texto copiado al portapapeles")
+                                st.code(template, language=None)
+                                
+                        except Exception as e:
+                            st.error("El documento no se pudo procesar correctamente debido a problemas de escaneo o calidad del archivo. Intenta subir una versión más legible.")
+            else:
+                st.info("Sube el documento de Determinación de Origen")
+        
+        elif tipo_documento_origen == "Dictamen Junta Regional":
+            st.markdown("### 📋 Dictamen de Junta Regional")
+            st.info("Funcionalidad en desarrollo")
+        
+        else:  # Recurso de Reposición
+            st.markdown("### ⚖️ Recurso de Reposición")
+            st.info("Funcionalidad en desarrollo")
+
+    @st.fragment
+    @timed_fragment("busqueda")
+    def _render_search(self):
+        """Renderiza el panel de búsqueda de dictámenes ya procesados"""
+        st.markdown("### 🔎 Búsqueda de Dictámenes Procesados")
+        texto = st.text_input("Texto libre (busca en el texto OCR y en las plantillas)", key="search_text")
+        col_numero, col_fecha = st.columns(2)
+        numero_dictamen = col_numero.text_input("Número de dictamen (exacto)", key="search_numero")
+        fecha = col_fecha.text_input("Fecha (exacta, como aparece en el dictamen)", key="search_fecha")
+        col_entidad, col_persona = st.columns(2)
+        entidad = col_entidad.text_input("Entidad", key="search_entidad")
+        persona = col_persona.text_input("Persona", key="search_persona")
+
+        if not any(valor.strip() for valor in (texto, numero_dictamen, fecha, entidad, persona)):
+            st.info("Ingresa al menos un criterio de búsqueda")
+            return
+
+        casos = self.case_store.search(texto, numero_dictamen, entidad, persona, fecha)
+        if not casos:
+            st.warning("No se encontraron dictámenes con esos criterios")
+            return
+
+        for caso in casos:
+            titulo = " · ".join(filter(None, [
+                caso["tipo"], caso["numero_dictamen"], caso["entidad"], caso["persona"], caso["fecha"], caso["nombre"]
+            ]))
+            with st.expander(titulo):
+                st.text_area("", caso["plantilla"], height=300, key=f"search_result_{caso['id']}")
+                st.json(caso["campos"], expanded=False)
+
+    def _process_document(self, tipo: str, uploaded_file,
+                          mensaje_exito: str = "¡Plantilla generada exitosamente!") -> Dict:
+        """Procesa el PDF subido con el flujo del tipo indicado, mostrando el avance por página.
+        Muestra mensaje_exito solo si el resultado está completo; si no, solo el aviso de resultado parcial."""
+        progress_bar = st.progress(0, text="Procesando páginas...")
+        resultado = self.document_service.process(
+            tipo,
+            uploaded_file.getvalue(),
+            getattr(uploaded_file, "name", ""),
+            on_page=lambda completadas, total: progress_bar.progress(
+                completadas / total, text=f"Procesadas {completadas} de {total} páginas"
+            )
+        )
+        progress_bar.empty()
+        if resultado["texto_reutilizado"]:
+            st.info("Este documento ya fue procesado; se reutiliza el texto almacenado.")
+        if resultado["completo"]:
+            st.success(mensaje_exito)
+        else:
+            st.warning("El documento no se procesó por completo a tiempo. Se muestra el resultado parcial; "
+                       "las páginas y campos faltantes están marcados en la plantilla.")
+            with st.expander("Texto extraído por página"):
+                st.text_area("", DocumentService.join_pages(resultado["paginas"]).strip(), height=300,
+                             key=f"paginas_{tipo}")
+        return resultado
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache(max_entries: int, ttl_seconds: int) -> ResultCache:
+    """Caché de resultados única por proceso, compartida por todas las sesiones"""
+    return ResultCache(max_entries, ttl_seconds)
+
+@st.cache_resource(show_spinner=False)
+def get_render_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool de procesos de rasterización, único por proceso.
+    Se usa "spawn" porque el servidor de Streamlit ya tiene hilos en ejecución."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+@st.cache_resource(show_spinner=False)
+def get_ocr_pool(workers: int) -> ThreadPoolExecutor:
+    """Pool de hilos de OCR, único por proceso"""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+
+@st.cache_resource(show_spinner=False)
+def get_tile_pool(workers: int) -> ThreadPoolExecutor:
+    """Pool de hilos para el OCR por franjas; separado del de páginas para evitar bloqueos
+    cuando una página espera a sus propias franjas"""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-tile")
+
+def create_document_service(config: Config, result_cache: ResultCache, render_pool: ProcessPoolExecutor,
+                            ocr_pool: ThreadPoolExecutor,
+                            tile_pool: Optional[ThreadPoolExecutor] = None,
+                            prompt_stats: Optional[PromptCacheStats] = None) -> DocumentService:
+    """Construye los servicios de procesamiento sobre los recursos compartidos indicados"""
+    openai_service = OpenAIService(config, result_cache, prompt_stats=prompt_stats)
+    case_store = CaseStore(config.CASE_STORE_PATH)
+    ocr_pipeline = OCRPipeline(openai_service, config, render_pool, ocr_pool, tile_pool)
+    return DocumentService(openai_service, case_store, ocr_pipeline)
+
+class RunTimings:
+    """Duración de las ejecuciones del script y de los fragmentos.
+    La primera ejecución del script corresponde al arranque en frío del proceso; las
+    interacciones dentro de una pestaña solo vuelven a ejecutar su fragmento."""
+
+    def __init__(self, max_samples: int = 500):
+        self.max_samples = max_samples
+        self.cold_start = None
+        self.samples = deque(maxlen=max_samples)
+        self.fragments = {}
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            if self.cold_start is None:
+                self.cold_start = seconds
+            else:
+                self.samples.append(seconds)
+
+    def record_fragment(self, name: str, seconds: float):
+        with self._lock:
+            self.fragments.setdefault(name, deque(maxlen=self.max_samples)).append(seconds)
+
+    @staticmethod
+    def _ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    @classmethod
+    def _percentiles(cls, samples: List[float]) -> Dict:
+        ordered = sorted(samples)
+        return {
+            "mediana_ms": cls._ms(ordered[len(ordered) // 2]) if ordered else None,
+            "p95_ms": cls._ms(ordered[int(len(ordered) * 0.95)]) if ordered else None
+        }
+
+    def summary(self) -> Dict:
+        """Tiempos en milisegundos: arranque en frío, última recarga, mediana y p95 de las recargas"""
+        with self._lock:
+            samples = list(self.samples)
+        percentiles = self._percentiles(samples)
+        return {
+            "arranque_ms": self._ms(self.cold_start),
+            "ultima_recarga_ms": self._ms(samples[-1] if samples else None),
+            "mediana_recarga_ms": percentiles["mediana_ms"],
+            "p95_recarga_ms": percentiles["p95_ms"],
+            "recargas": len(samples)
+        }
+
+    def fragment_summary(self, name: str) -> Dict:
+        """Tiempos en milisegundos de las ejecuciones de un fragmento: última, mediana y p95"""
+        with self._lock:
+            samples = list(self.fragments.get(name, ()))
+        return {"ultima_ms": self._ms(samples[-1] if samples else None), **self._percentiles(samples),
+                "ejecuciones": len(samples)}
+
+@st.cache_resource(show_spinner=False)
+def get_run_timings() -> RunTimings:
+    return RunTimings()
+
+@st.cache_resource(show_spinner=False)
+def get_prompt_stats() -> PromptCacheStats:
+    """Medición de la caché de prefijos del proveedor, única por proceso"""
+    return PromptCacheStats()
+
+@st.cache_resource(show_spinner=False)
+def get_document_service() -> DocumentService:
+    """Servicios de procesamiento creados una sola vez por proceso y compartidos por todas las sesiones"""
+    config = Config()
+    return create_document_service(
+        config,
+        get_result_cache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS),
+        get_render_pool(config.RENDER_WORKERS),
+        get_ocr_pool(config.OCR_POOL_WORKERS),
+        get_tile_pool(config.OCR_POOL_WORKERS) if config.OCR_TILES > 1 else None,
+        get_prompt_stats()
+    )
 
 def main():
     """Función principal de la aplicación"""
-    config = Config()
-    pdf_processor = PDFProcessor()
-    openai_service = OpenAIService(config)
-    ui = StreamlitUI(pdf_processor, openai_service)
+    configure_openai()
+    document_service = get_document_service()
+    ui = StreamlitUI(document_service)
     ui.render()
 
+    timings = get_run_timings()
+    timings.record(time.perf_counter() - _SCRIPT_START)
+    if document_service.openai_service.config.SHOW_TIMINGS:
+        st.caption(" · ".join(f"{nombre}: {valor}" for nombre, valor in timings.summary().items()))
+        if document_service.openai_service.cache:
+            st.caption("caché de resultados: " + " · ".join(
+                f"{nombre}: {valor}" for nombre, valor in document_service.openai_service.cache.summary().items()
+            ))
+        prompt_stats = document_service.openai_service.prompt_stats.summary()
+        if prompt_stats:
+            st.caption(" · ".join(
+                f"{operacion} (v{stats['version_prompt']}): {stats['proporcion_cache']:.0%} de "
+                f"{stats['tokens_entrada']} tokens en caché"
+                for operacion, stats in prompt_stats.items()
+            ))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""Modo por lotes para rezagos no urgentes.
+
+En lugar de llamar a la API página por página, cada ronda compila en archivos JSONL las
+solicitudes que aún no tienen resultado (OCR, luego corrección, luego extracción), las
+envía como un lote (/v1/files + /v1/batches), espera a que termine y guarda las respuestas.
+La siguiente ronda vuelve a ejecutar el flujo normal de cada documento: las llamadas ya
+resueltas salen de la caché y solo se registran las de la etapa siguiente. Cuando un
+documento ya no tiene solicitudes pendientes se genera su plantilla; si algún campo no se
+pudo extraer, el documento queda "parcial" (plantilla marcada) y no se guarda como caso.
+
+El estado se guarda en el directorio de trabajo, de modo que un proceso interrumpido se
+reanuda sin volver a enviar lo que ya se resolvió. Para probar contra un servidor sustituto
+que implemente los endpoints de lotes, define OPENAI_API_BASE.
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import openai
+from openai import api_requestor
+
+import pdf_workers
+from app import Config, CaseStore, DocumentService, OpenAIService, RequestRecorder, ResultCache
+
+FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchClient:
+    """Cliente mínimo de la API de lotes compatible con OpenAI"""
+
+    def __init__(self):
+        self.requestor = api_requestor.APIRequestor()
+
+    def submit(self, jsonl_path: str) -> str:
+        """Sube el archivo JSONL y crea el lote; retorna el id del lote"""
+        with open(jsonl_path, "rb") as f:
+            uploaded = openai.File.create(file=f, purpose="batch")
+        response, _, _ = self.requestor.request("post", "/batches", params={
+            "input_file_id": uploaded["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        })
+        return response.data["id"]
+
+    def status(self, batch_id: str) -> Dict:
+        response, _, _ = self.requestor.request("get", f"/batches/{batch_id}")
+        return response.data
+
+    def results(self, batch: Dict) -> Dict[str, str]:
+        """Descarga el archivo de salida de un lote terminado; retorna {custom_id: contenido}.
+        Las solicitudes fallidas no aparecen y se vuelven a registrar en la siguiente ronda."""
+        if not batch.get("output_file_id"):
+            return {}
+        output = openai.File.download(batch["output_file_id"])
+        results = {}
+        for line in output.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        return results
+
+
+class BulkProcessor:
+    """Procesa muchos documentos en rondas de lotes, con estado reanudable en work_dir"""
+
+    def __init__(self, config: Config, work_dir: str, batch_client: BatchClient,
+                 render_pool: Optional[ProcessPoolExecutor] = None):
+        self.config = config
+        self.work_dir = work_dir
+        self.batch_client = batch_client
+        self.render_pool = render_pool
+        os.makedirs(os.path.join(work_dir, "paginas"), exist_ok=True)
+        os.makedirs(os.path.join(work_dir, "lotes"), exist_ok=True)
+        os.makedirs(os.path.join(work_dir, "salida"), exist_ok=True)
+
+        self.state_path = os.path.join(work_dir, "estado.json")
+        self.results_path = os.path.join(work_dir, "resultados.jsonl")
+        self.state = {"documentos": {}, "lotes": [], "ronda": 0}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+        # Caché sin expiración con todas las respuestas recibidas hasta ahora
+        self.cache = ResultCache(max_entries=10 ** 9, ttl_seconds=10 ** 9)
+        if os.path.exists(self.results_path):
+            with open(self.results_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self.cache.set(item["key"], item["content"])
+
+        self.case_store = CaseStore(config.CASE_STORE_PATH)
+        self.document_service = DocumentService(OpenAIService(config, self.cache), self.case_store, None)
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def add(self, paths: List[str], tipo: str):
+        """Agrega documentos al trabajo (los ya agregados se ignoran)"""
+        if tipo not in DocumentService.TIPOS:
+            raise ValueError(f"Tipo de documento no soportado: {tipo}")
+        for path in paths:
+            with open(path, "rb") as f:
+                documento = CaseStore.document_id(f.read())
+            self.state["documentos"].setdefault(documento, {
+                "ruta": os.path.abspath(path),
+                "nombre": os.path.basename(path),
+                "tipo": tipo,
+                "estado": "pendiente"
+            })
+        self._save_state()
+
+    def _page_images(self, documento: str, info: Dict) -> Iterator[str]:
+        """Imágenes base64 de cada página, rasterizadas una sola vez y guardadas en work_dir.
+        Se rasteriza por rangos de PAGES_PER_TASK páginas, escribiendo cada rango al terminar,
+        y las imágenes se leen de una en una para no tener el documento completo en memoria."""
+        directory = os.path.join(self.work_dir, "paginas", documento)
+        if not os.path.isdir(directory):
+            tmp_directory = directory + ".tmp"
+            os.makedirs(tmp_directory, exist_ok=True)
+            total = pdf_workers.count_pages(info["ruta"])
+            for first in range(1, total + 1, self.config.PAGES_PER_TASK):
+                last = min(first + self.config.PAGES_PER_TASK - 1, total)
+                if os.path.exists(os.path.join(tmp_directory, f"{last:04d}.b64")):
+                    continue  # Rango ya rasterizado antes de una interrupción
+                args = (info["ruta"], first, last, self.config.RENDER_DPI)
+                if self.render_pool:
+                    pages = self.render_pool.submit(pdf_workers.render_pages, *args).result()
+                else:
+                    pages = pdf_workers.render_pages(*args)
+                for offset, (base64_img, _) in enumerate(pages):
+                    with open(os.path.join(tmp_directory, f"{first + offset:04d}.b64"), "w") as f:
+                        f.write(base64_img)
+            os.replace(tmp_directory, directory)
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name)) as f:
+                yield f.read()
+
+    def _run_document(self, documento: str, info: Dict) -> Dict:
+        """Ejecuta el flujo del documento; retorna las solicitudes que faltan (vacío si terminó).
+        Si el documento ya se procesó (en la aplicación, el servicio o un lote anterior), se
+        reutiliza el texto almacenado en lugar de repetir el OCR. Si al terminar quedan campos
+        sin extraer, el resultado se marca como parcial y no se guarda como caso."""
+        recorder = RequestRecorder()
+        service = OpenAIService(self.config, self.cache, recorder=recorder)
+        paginas_guardadas = self.case_store.get_pages(documento)
+        paginas = paginas_guardadas or [
+            service.correct_text(service.extract_text_from_image(base64_img))
+            for base64_img in self._page_images(documento, info)
+        ]
+        campos, plantilla, claves, faltantes = self.document_service.extract(
+            info["tipo"], DocumentService.join_pages(paginas), service
+        )
+        if recorder.requests:
+            return recorder.requests
+
+        if not paginas_guardadas:
+            self.case_store.save_pages(documento, info["nombre"], paginas)
+        if faltantes:
+            caso_id = None
+            plantilla = DocumentService.incomplete_notice([], faltantes) + "\n\n" + plantilla
+        else:
+            caso_id = self.case_store.save_case(documento, info["tipo"], campos, plantilla, **claves)
+        base = os.path.join(self.work_dir, "salida", os.path.splitext(info["nombre"])[0] + f"-{documento[:8]}")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(plantilla)
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"caso_id": caso_id, "tipo": info["tipo"], "campos": campos,
+                       "campos_faltantes": faltantes}, f, ensure_ascii=False, indent=2)
+        info["estado"] = "parcial" if faltantes else "completado"
+        info["salida"] = base + ".txt"
+        return {}
+
+    def _write_batches(self, requests: Dict[str, Dict]) -> List[Dict]:
+        """Escribe las solicitudes en uno o más archivos JSONL respetando los límites de tamaño"""
+        batches, lines, size = [], [], 0
+        ronda = self.state["ronda"]
+
+        def flush():
+            path = os.path.join(self.work_dir, "lotes", f"ronda{ronda:02d}-{len(batches) + 1:03d}.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(line for line, _ in lines)
+            batches.append({"archivo": path, "solicitudes": dict(ids for _, ids in lines)})
+
+        for key, body in requests.items():
+            custom_id = hashlib.sha256(key.encode("utf-8")).hexdigest()
+            line = json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            }, ensure_ascii=False) + "\n"
+            line_size = len(line.encode("utf-8"))
+            if lines and (size + line_size > self.config.BATCH_MAX_BYTES or len(lines) >= self.config.BATCH_MAX_REQUESTS):
+                flush()
+                lines, size = [], 0
+            lines.append((line, (custom_id, key)))
+            size += line_size
+        if lines:
+            flush()
+        return batches
+
+    def _wait_for_batches(self, log):
+        """Espera los lotes en curso y guarda sus respuestas en resultados.jsonl y en la caché"""
+        for batch in self.state["lotes"]:
+            if batch.get("recibido"):
+                continue
+            if not batch.get("id"):
+                batch["id"] = self.batch_client.submit(batch["archivo"])
+                self._save_state()
+                log(f"Lote enviado: {batch['id']} ({len(batch['solicitudes'])} solicitudes)")
+            while True:
+                status = self.batch_client.status(batch["id"])
+                if status.get("status") in FINAL_STATES:
+                    break
+                time.sleep(self.config.BATCH_POLL_SECONDS)
+
+            results = self.batch_client.results(status)
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                for custom_id, content in results.items():
+                    key = batch["solicitudes"].get(custom_id)
+                    if key is not None:
+                        f.write(json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n")
+                        self.cache.set(key, content)
+            batch["recibido"] = True
+            self._save_state()
+            log(f"Lote {batch['id']}: {status.get('status')}, {len(results)} de {len(batch['solicitudes'])} respuestas")
+
+    def run(self, log=print) -> Dict[str, Dict]:
+        """Procesa todos los documentos pendientes hasta terminarlos o agotar las rondas"""
+        self._wait_for_batches(log)
+        while True:
+            pending = {}
+            for documento, info in self.state["documentos"].items():
+                if info["estado"] != "pendiente":
+                    continue
+                try:
+                    pending.update(self._run_document(documento, info))
+                except Exception as e:
+                    info["estado"] = "error"
+                    info["error"] = str(e)
+            self._save_state()
+            if not pending:
+                break
+            if self.state["ronda"] >= self.config.BATCH_MAX_ROUNDS:
+                for info in self.state["documentos"].values():
+                    if info["estado"] == "pendiente":
+                        info["estado"] = "error"
+                        info["error"] = "Se agotaron las rondas de lotes con solicitudes sin respuesta"
+                self._save_state()
+                break
+
+            self.state["ronda"] += 1
+            self.state["lotes"] = self._write_batches(pending)
+            self._save_state()
+            log(f"Ronda {self.state['ronda']}: {len(pending)} solicitudes en {len(self.state['lotes'])} lote(s)")
+            self._wait_for_batches(log)
+        return self.state["documentos"]
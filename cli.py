@@ -0,0 +1,89 @@
+import argparse
+import json
+import sys
+import time
+
+from app import Config, CaseStore, DocumentService, configure_openai
+
+
+def buscar(args, config: Config):
+    """Busca dictámenes ya procesados en la base local"""
+    case_store = CaseStore(args.base or config.CASE_STORE_PATH)
+    inicio = time.perf_counter()
+    casos = case_store.search(
+        texto=" ".join(args.texto),
+        numero_dictamen=args.numero,
+        entidad=args.entidad,
+        persona=args.persona,
+        fecha=args.fecha,
+        limit=args.limite
+    )
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+
+    if args.json:
+        json.dump(casos, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for caso in casos:
+            print(f"[{caso['id']}] {caso['tipo']} | dictamen: {caso['numero_dictamen'] or '-'} | "
+                  f"entidad: {caso['entidad'] or '-'} | persona: {caso['persona'] or '-'} | "
+                  f"fecha: {caso['fecha'] or '-'} | archivo: {caso['nombre'] or '-'}")
+            if args.plantilla:
+                print(caso["plantilla"])
+                print()
+    print(f"{len(casos)} resultado(s) en {duracion_ms:.1f} ms", file=sys.stderr)
+
+
+def lote(args, config: Config):
+    """Procesa (o reanuda) un rezago de documentos usando la API de lotes"""
+    from bulk import BatchClient, BulkProcessor
+
+    configure_openai()
+    if args.base:
+        config.CASE_STORE_PATH = args.base
+    if args.intervalo:
+        config.BATCH_POLL_SECONDS = args.intervalo
+    processor = BulkProcessor(config, args.dir, BatchClient())
+    if args.archivos:
+        if not args.tipo:
+            raise SystemExit("Indica --tipo para agregar documentos")
+        processor.add(args.archivos, args.tipo)
+
+    documentos = processor.run(log=lambda mensaje: print(mensaje, file=sys.stderr))
+    for documento, info in documentos.items():
+        detalle = info.get("salida") or info.get("error") or ""
+        print(f"{info['estado']:<11} {info['nombre']} {detalle}")
+
+
+def main():
+    """Punto de entrada de la línea de comandos"""
+    config = Config()
+    parser = argparse.ArgumentParser(description="Herramientas de línea de comandos para dictámenes JNCI")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_buscar = subparsers.add_parser("buscar", help="Busca dictámenes ya procesados")
+    parser_buscar.add_argument("texto", nargs="*", help="Texto libre (OCR y plantillas)")
+    parser_buscar.add_argument("--numero", help="Número de dictamen (exacto)")
+    parser_buscar.add_argument("--entidad", help="Entidad calificadora o Junta Regional")
+    parser_buscar.add_argument("--persona", help="Persona que interpone el recurso")
+    parser_buscar.add_argument("--fecha", help="Fecha del dictamen o de estructuración (exacta)")
+    parser_buscar.add_argument("--limite", type=int, default=20, help="Número máximo de resultados")
+    parser_buscar.add_argument("--plantilla", action="store_true", help="Muestra la plantilla de cada resultado")
+    parser_buscar.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    parser_buscar.add_argument("--base", help="Ruta de la base local (por defecto Config.CASE_STORE_PATH)")
+    parser_buscar.set_defaults(func=buscar)
+
+    parser_lote = subparsers.add_parser("lote", help="Procesa un rezago de documentos con la API de lotes")
+    parser_lote.add_argument("archivos", nargs="*", help="PDFs a agregar (omite para solo reanudar)")
+    parser_lote.add_argument("--dir", required=True, help="Directorio de trabajo (estado reanudable y salidas)")
+    parser_lote.add_argument("--tipo", choices=DocumentService.TIPOS, help="Tipo de los documentos a agregar")
+    parser_lote.add_argument("--intervalo", type=int, help="Segundos entre consultas del estado del lote")
+    parser_lote.add_argument("--base", help="Ruta de la base local (por defecto Config.CASE_STORE_PATH)")
+    parser_lote.set_defaults(func=lote)
+
+    args = parser.parse_args()
+    args.func(args, config)
+
+
+if __name__ == "__main__":
+    main()
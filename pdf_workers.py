@@ -0,0 +1,55 @@
+"""Rasterización y codificación de páginas en procesos separados.
+
+Estas funciones viven en un módulo propio, sin dependencias de Streamlit,
+para que los procesos hijos del pool puedan importarlas.
+"""
+import base64
+import io
+from typing import List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # pdf2image y PIL se importan al primer uso para no pesar en el arranque de la aplicación
+    from PIL import Image
+
+
+def image_to_base64(image: "Image.Image") -> str:
+    """Convierte una imagen a formato base64 (PNG)"""
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def ink_density(image: "Image.Image") -> float:
+    """Fracción de píxeles oscuros de la imagen (aproximación de la cantidad de texto)"""
+    histogram = image.convert("L").histogram()
+    return sum(histogram[:128]) / max(sum(histogram), 1)
+
+
+def count_pages(pdf_path: str) -> int:
+    """Retorna el número de páginas del PDF"""
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path)["Pages"]
+
+
+def render_pages(pdf_path: str, first_page: int, last_page: int, dpi: int) -> List[Tuple[str, float]]:
+    """Rasteriza un rango de páginas (1-indexado, inclusivo).
+    Retorna, por página, la imagen en base64 y su densidad de tinta."""
+    from pdf2image import convert_from_path
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+    return [(image_to_base64(image), ink_density(image)) for image in images]
+
+
+def render_bands(pdf_path: str, page: int, dpi: int, bands: int, overlap: float) -> List[str]:
+    """Rasteriza una página y la divide en franjas horizontales que se solapan.
+    overlap es la fracción de la altura de cada franja que se comparte con sus vecinas."""
+    from pdf2image import convert_from_path
+    [image] = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page)
+    width, height = image.size
+    band_height = height / bands
+    margin = int(band_height * overlap)
+    crops = []
+    for i in range(bands):
+        top = max(0, int(i * band_height) - margin)
+        bottom = min(height, int((i + 1) * band_height) + margin)
+        crops.append(image_to_base64(image.crop((0, top, width, bottom))))
+    return crops
@@ -0,0 +1,287 @@
+"""Registro central y versionado de los prompts enviados a OpenAI.
+
+Cada operación tiene un prompt de sistema y una instrucción fijos, escritos sin sangría
+para que sus bytes no dependan de dónde se construye la solicitud. Los mensajes siempre
+llevan primero el prefijo estático (sistema + instrucción) y al final el contenido variable
+del documento, de modo que las llamadas repetidas de una operación empiezan con los mismos bytes.
+
+Limitación: el proveedor solo guarda en su caché de prefijos solicitudes de al menos 1.024
+tokens, y el prefijo fijo más largo (extract_first_opportunity_origin_info, unos 2.250
+caracteres) tiene entre 600 y 700. Por sí solos, los prefijos fijos actuales no se reutilizan; el orden
+estable solo evita que un prompt que supere el umbral pierda la caché por cambios de formato.
+La proporción real se mide por operación en app.PromptCacheStats.
+
+Al modificar el texto de un prompt se debe incrementar su versión.
+"""
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """Prompt de una operación: prefijo estático y versión"""
+    name: str
+    version: int
+    system: str
+    instruction: str
+
+    def messages(self, text: str) -> List[Dict]:
+        """Mensajes para un texto: instrucción fija primero y el texto del documento al final"""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": f"{self.instruction}\n\n{text}"}
+        ]
+
+    def image_messages(self, base64_image: str) -> List[Dict]:
+        """Mensajes para una imagen: instrucción fija primero y la imagen al final"""
+        return [
+            {"role": "system", "content": self.system},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self.instruction},
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64_image}"}}
+                ]
+            }
+        ]
+
+
+PROMPTS: Dict[str, Prompt] = {prompt.name: prompt for prompt in [
+    Prompt(
+        name="extract_text_from_image",
+        version=1,
+        system="Eres un OCR especializado. Extrae el texto de la imagen y devuélvelo exactamente como aparece, sin hacer correcciones. Mantén el formato y la estructura del texto original.",
+        instruction="Extrae el texto de esta imagen manteniendo el formato original."
+    ),
+    Prompt(
+        name="correct_text",
+        version=1,
+        system="Eres un corrector ortográfico especializado. Corrige solo errores ortográficos manteniendo el significado y estructura original del texto. No cambies palabras, puntuación ni estructura, incluso si no tiene sentido. Mantén el formato y los saltos de línea.",
+        instruction="Corrige la ortografía del siguiente texto manteniendo su estructura y formato:"
+    ),
+    Prompt(
+        name="extract_junta_location",
+        version=1,
+        system="""\
+Eres un especialista en identificar la ubicación de Juntas Regionales de Calificación.
+Extrae el departamento o ciudad donde se realizó la Junta Regional.
+Devuelve solo el nombre del departamento o ciudad, sin texto adicional.""",
+        instruction="Identifica el departamento o ciudad donde se realizó esta Junta Regional de Calificación:"
+    ),
+    Prompt(
+        name="extract_analysis_and_conclusions",
+        version=1,
+        system="""\
+Eres un especialista en identificar análisis y conclusiones de Juntas Regionales de Calificación.
+Busca en el texto:
+1. Primero, la sección específica llamada "ANÁLISIS Y CONCLUSIONES", que se ubica al final del acta, luego de la sección de "Fundamentos de derecho"
+2. Luego busca la valoración del calificador y equipo interdisciplinario, esta se encuentra luego de la sección de "Concepto de rehabilitación"
+3. También incluye la sección de "otros conceptos técnicos" si es relevante
+
+Extrae solo el texto de estas secciones concatendado uno debajo del otro, corrigiendo los errores de ortografía, sin modificar el formato original.
+No incluyas conclusiones de otras entidades, solo las de la Junta Regional.""",
+        instruction="Extrae el análisis y conclusiones de la Junta Regional del siguiente texto:"
+    ),
+    Prompt(
+        name="extract_medical_concepts",
+        version=1,
+        system="""\
+Eres un especialista en identificar conceptos médicos en actas de Junta Regional de Calificación.
+Busca en el texto:
+1. La sección "CONCEPTOS MÉDICOS"
+2. La sección "PRUEBAS ESPECÍFICAS"
+
+Extrae el texto exactamente como aparece en estas secciones, sin modificarlo.
+Si no encuentras estas secciones, devuelve un mensaje indicando que no se encontraron conceptos médicos.""",
+        instruction="Extrae los conceptos médicos del siguiente texto:"
+    ),
+    Prompt(
+        name="extract_recurring_name",
+        version=1,
+        system="""\
+Eres un especialista en identificar el nombre de la persona que interpone un recurso de reposición.
+Busca en el texto el nombre de la persona que presenta el recurso.
+Devuelve solo el nombre completo de la persona, sin texto adicional.""",
+        instruction="Identifica el nombre de la persona que interpone el recurso de reposición en el siguiente texto:"
+    ),
+    Prompt(
+        name="extract_pcl_info",
+        version=1,
+        system="""\
+Eres un especialista en extraer información de dictámenes de PCL de Juntas Regionales de Calificación.
+Extrae la siguiente información en formato JSON:
+{
+    "ubicacion": "string",
+    "numero_dictamen": "string",
+    "fecha_dictamen": "string",
+    "diagnosticos": ["string"],
+    "deficiencia_total": "string",
+    "rol_laboral": "string",
+    "pcl_total": "string",
+    "origen": "string",
+    "fecha_estructuracion": "string",
+    "deficiencias_calificadas": [
+        {
+            "nombre": "string",
+            "porcentaje": "string",
+            "fuente": "string (formato: Tabla X.Y)"
+        }
+    ],
+    "analisis_conclusiones": "string",
+    "valoracion_calificador": "string",
+    "otros_conceptos": "string"
+}
+Para la fuente de las deficiencias calificadas, extrae específicamente:
+- La tabla en formato "Tabla X.Y" (ejemplo: "Tabla 13.4")
+Si algún campo no se encuentra, déjalo como null.""",
+        instruction="Extrae la información del dictamen PCL del siguiente texto:"
+    ),
+    Prompt(
+        name="process_recurring_text",
+        version=1,
+        system="""\
+Eres un especialista en procesar textos de recursos de reposición.
+Extrae únicamente el texto que fundamenta la motivación de la inconformidad.
+Sigue estas reglas:
+1. Elimina pies de página y referencias a leyes citadas textualmente
+2. Mantén solo el texto que explica los argumentos y razones de la inconformidad
+3. Aplica corrección ortográfica básica sin cambiar el significado
+4. Si hay bloques en MAYÚSCULAS, conviértelos a minúsculas siguiendo reglas gramaticales
+5. Mantén la estructura y formato del texto principal""",
+        instruction="Extrae solo el texto principal que fundamenta la motivación de inconformidad del siguiente recurso, eliminando pies de página y citas textuales de leyes:"
+    ),
+    Prompt(
+        name="extract_recurring_entity",
+        version=1,
+        system="""\
+Eres un especialista en identificar quién presenta un recurso de reposición.
+Busca:
+1. Si es una persona natural:
+   - Si es hombre: "El señor [Nombre completo]"
+   - Si es mujer: "La señora [Nombre completo]"
+   - Si es apoderado: "El apoderado del señor/señora [Nombre completo]"
+2. Si es una entidad, identifica el tipo:
+   - Administradora de Riesgos Laborales (NOMBRE)
+   - Entidad Prestadora de Salud (NOMBRE)
+   - Administradora de Fondos Pensionales (NOMBRE)
+Si no puedes determinar con certeza, devuelve "[Entidad no identificada]"
+Devuelve solo el texto con el formato especificado.""",
+        instruction="Identifica quién presenta este recurso de reposición:"
+    ),
+    Prompt(
+        name="extract_first_opportunity_info",
+        version=1,
+        system="""\
+Eres un especialista en extraer información de calificaciones en primera oportunidad.
+Extrae la siguiente información en formato JSON:
+{
+    "tipo_entidad": "string (EPS/ARL/AFP)",
+    "nombre_entidad": "string (en mayúsculas)",
+    "diagnosticos": [
+        {
+            "diagnostico": "string",
+            "diagnostico_especifico": "string",
+            "lateralidad": "string",
+            "origen": "string"
+        }
+    ],
+    "deficiencias": [
+        {
+            "nombre": "string",
+            "porcentaje": "string"
+        }
+    ],
+    "deficiencia_total": "string",
+    "rol_laboral": "string",
+    "pcl_total": "string",
+    "origen": "string",
+    "fecha_estructuracion": "string",
+    "conceptos_medicos": [
+        {
+            "especialidad": "string (ej: ortopedia, fisiatría)",
+            "concepto": "string (texto del concepto)",
+            "fecha": "string (fecha de la historia clínica)",
+            "nombre_historia": "string (nombre de la historia clínica)"
+        }
+    ],
+    "pruebas_especificas": [
+        {
+            "tipo": "string (ej: RNM, electromiografía)",
+            "resultado": "string (texto del resultado)",
+            "fecha": "string (fecha de la historia clínica)",
+            "nombre_historia": "string (nombre de la historia clínica)"
+        }
+    ]
+}
+Sigue estas reglas:
+1. Para diagnósticos: combina diagnóstico + diagnóstico específico + lateralidad
+2. Para deficiencias: extrae nombre y porcentaje total
+3. Para entidad: identifica tipo (EPS/ARL/AFP) y nombre en mayúsculas
+4. Para conceptos médicos:
+   - Extrae la especialidad y el concepto completo
+   - Extrae la fecha de la historia clínica
+   - Extrae el nombre de la historia clínica
+5. Para pruebas específicas:
+   - Extrae el tipo de prueba y su resultado
+   - Extrae la fecha de la historia clínica
+   - Extrae el nombre de la historia clínica
+6. Si algún campo no se encuentra, déjalo como null
+7. Si el diagnóstico contiene abreviaturas, como 'L4-L5', 'C3-C4', o similares, deben aparecer en mayúsculas.""",
+        instruction="Extrae la información de la calificación en primera oportunidad del siguiente texto:"
+    ),
+    Prompt(
+        name="extract_first_opportunity_origin_info",
+        version=1,
+        system="""\
+Eres un especialista en extraer información de determinación de origen en primera oportunidad.
+Extrae la siguiente información en formato JSON:
+{
+    "tipo_entidad": "string (debe ser exactamente 'EPS', 'ARL' o 'AFP')",
+    "nombre_entidad": "string (en MAYÚSCULAS)",
+    "diagnosticos": [
+        {
+            "nombre": "string (primera letra mayúscula, resto minúsculas)",
+            "lateralidad": "string (solo si aparece textualmente: derecho, izquierdo, bilateral)",
+            "origen": "string (debe ser exactamente 'Enfermedad común' o 'Enfermedad laboral')"
+        }
+    ],
+    "conceptos_medicos": [
+        {
+            "especialidad": "string (ej: ortopedia, fisiatría)",
+            "concepto": "string (texto del concepto)",
+            "fecha": "string (fecha de la historia clínica)",
+            "nombre_historia": "string (nombre de la historia clínica)"
+        }
+    ],
+    "pruebas_especificas": [
+        {
+            "tipo": "string (ej: RNM, electromiografía)",
+            "resultado": "string (texto del resultado)",
+            "fecha": "string (fecha de la historia clínica)",
+            "nombre_historia": "string (nombre de la historia clínica)"
+        }
+    ]
+}
+
+Reglas importantes:
+1. Para tipo_entidad: Identifica si es EPS, ARL o AFP basado en el texto
+2. Para nombre_entidad: Extrae SOLO el nombre en MAYÚSCULAS
+3. Para diagnósticos:
+   - Búscalos en la sección de diagnósticos y en las conclusiones
+   - Primera letra mayúscula, resto en minúsculas
+   - Incluye lateralidad SOLO si aparece textualmente
+   - El origen debe ser exactamente "Enfermedad común" o "Enfermedad laboral"
+4. Para conceptos médicos:
+   - Extrae la especialidad y el concepto completo
+   - Extrae la fecha de la historia clínica
+   - Extrae el nombre de la historia clínica
+   - Busca en secciones como "CONCEPTOS MÉDICOS" o "CONCEPTO DE ESPECIALISTA"
+5. Para pruebas específicas:
+   - Extrae el tipo de prueba y su resultado
+   - Extrae la fecha de la historia clínica
+   - Extrae el nombre de la historia clínica
+   - Busca en secciones como "PRUEBAS ESPECÍFICAS" o "EXÁMENES PARACLÍNICOS"
+6. Si no puedes identificar algún campo con certeza, déjalo como null""",
+        instruction="Extrae la información de determinación de origen del siguiente texto:"
+    ),
+]}
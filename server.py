@@ -0,0 +1,267 @@
+"""Servicio HTTP para procesar dictámenes sin la interfaz de Streamlit.
+
+Expone los mismos flujos que la aplicación (ver DocumentService.TIPOS):
+
+    POST /procesar/<tipo>            Procesa un PDF y espera el resultado
+    POST /procesar/<tipo>?modo=async Encola el PDF y retorna el identificador del trabajo
+    GET  /trabajos/<id>              Estado (y resultado) de un trabajo
+    GET  /salud                      Estado del servicio, ocupación del pool y uso de la caché de prompts
+
+El cuerpo de POST puede ser el PDF (Content-Type: application/pdf) o un JSON con
+{"ruta": "archivo.pdf"} (relativa a --raiz) o {"pdf_base64": "...", "nombre": "..."}.
+
+Para probar localmente contra un servidor de modelos sustituto, basta con definir
+OPENAI_API_BASE (p. ej. http://localhost:8080/v1) antes de iniciar el servicio.
+"""
+import argparse
+import base64
+import binascii
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+from app import Config, DocumentService, PromptCacheStats, ResultCache, configure_openai, create_document_service
+
+MAX_BODY_BYTES = 200 * 1024 * 1024  # Igual que server.maxUploadSize de Streamlit
+
+
+class JobManager:
+    """Pool de trabajadores compartido con control de admisión.
+
+    Como máximo max_pending trabajos pueden estar en cola o en proceso; por encima de
+    ese límite las solicitudes se rechazan de inmediato (contrapresión) en lugar de
+    acumularse sin límite.
+    """
+
+    def __init__(self, document_service: DocumentService, workers: int, max_pending: int, max_kept: int = 1000):
+        self.document_service = document_service
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_kept = max_kept
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trabajo")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def reserve(self) -> bool:
+        """Reserva un cupo antes de leer el documento; retorna False si el servicio está saturado"""
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        """Libera un cupo reservado que no llegó a usarse (p. ej. solicitud inválida)"""
+        self._slots.release()
+
+    def submit(self, tipo: str, pdf_bytes: bytes, nombre: str):
+        """Encola un trabajo sobre un cupo ya reservado con reserve(); retorna (trabajo, futuro)"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "tipo": tipo,
+            "nombre": nombre,
+            "estado": "en_cola",
+            "creado": datetime.now().isoformat(timespec="seconds")
+        }
+        with self._lock:
+            self._pending += 1
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > self.max_kept:
+                self._jobs.popitem(last=False)
+        future = self._executor.submit(self._run, job, pdf_bytes)
+        return job, future
+
+    def _run(self, job: Dict, pdf_bytes: bytes) -> Dict:
+        job["estado"] = "procesando"
+        try:
+            job["resultado"] = self.document_service.process(job["tipo"], pdf_bytes, job["nombre"])
+            job["estado"] = "completado"
+        except Exception as e:
+            job["estado"] = "error"
+            job["error"] = str(e)
+        finally:
+            job["terminado"] = datetime.now().isoformat(timespec="seconds")
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Manejador HTTP; create_server asigna las dependencias en una subclase por servidor"""
+
+    jobs: JobManager = None
+    files_root: Optional[str] = None
+    sync_timeout: float = 600
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/salud":
+            self._send_json(200, {
+                "estado": "ok",
+                "trabajadores": self.jobs.workers,
+                "pendientes": self.jobs.pending,
+                "max_pendientes": self.jobs.max_pending,
+                "cache_resultados": self.jobs.document_service.openai_service.cache.summary(),
+                "cache_prompts": self.jobs.document_service.openai_service.prompt_stats.summary()
+            })
+        elif path.startswith("/trabajos/"):
+            job = self.jobs.get(path.split("/")[-1])
+            if job is None:
+                self._send_json(404, {"error": "Trabajo no encontrado"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "procesar":
+            self._send_json(404, {"error": "Ruta no encontrada"})
+            return
+        tipo = parts[1]
+        if tipo not in DocumentService.TIPOS:
+            self._send_json(404, {"error": f"Tipo no soportado. Opciones: {', '.join(DocumentService.TIPOS)}"})
+            return
+
+        # El cupo se reserva antes de leer el cuerpo: una solicitud rechazada no ocupa memoria
+        if not self.jobs.reserve():
+            self.close_connection = True
+            self._send_json(503, {"error": "Servicio saturado, intenta más tarde"},
+                            {"Retry-After": "30", "Connection": "close"})
+            return
+        try:
+            pdf_bytes, nombre = self._read_document()
+        except ValueError as e:
+            self.jobs.release()
+            self._send_json(400, {"error": str(e)})
+            return
+
+        job, future = self.jobs.submit(tipo, pdf_bytes, nombre)
+
+        if parse_qs(url.query).get("modo", ["sync"])[0] == "async":
+            self._send_json(202, {"id": job["id"], "estado": job["estado"]}, {"Location": f"/trabajos/{job['id']}"})
+            return
+        try:
+            future.result(timeout=self.sync_timeout)
+        except TimeoutError:
+            # El trabajo continúa; el cliente puede consultarlo como si fuera asíncrono
+            self._send_json(202, {"id": job["id"], "estado": job["estado"]}, {"Location": f"/trabajos/{job['id']}"})
+            return
+        self._send_json(200 if job["estado"] == "completado" else 500, job)
+
+    def _read_document(self):
+        """Lee el PDF del cuerpo de la solicitud; retorna (bytes, nombre)"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            raise ValueError("El cuerpo de la solicitud está vacío")
+        if length > MAX_BODY_BYTES:
+            raise ValueError("El documento supera el tamaño máximo permitido")
+        body = self.rfile.read(length)
+
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError:
+                raise ValueError("JSON inválido")
+            if not isinstance(data, dict):
+                raise ValueError("Se esperaba un objeto JSON")
+            if data.get("pdf_base64"):
+                try:
+                    return base64.b64decode(data["pdf_base64"], validate=True), str(data.get("nombre", ""))
+                except (binascii.Error, TypeError):
+                    raise ValueError("pdf_base64 no es base64 válido")
+            if isinstance(data.get("ruta"), str) and data["ruta"]:
+                return self._read_path(data["ruta"]), os.path.basename(data["ruta"])
+            raise ValueError("Se esperaba 'ruta' o 'pdf_base64'")
+
+        if not body.startswith(b"%PDF"):
+            raise ValueError("El cuerpo no es un PDF")
+        return body, self.headers.get("X-Nombre-Archivo", "")
+
+    def _read_path(self, ruta: str) -> bytes:
+        """Lee un PDF del disco, solo dentro del directorio raíz configurado"""
+        if not self.files_root:
+            raise ValueError("La lectura por ruta no está habilitada (usa --raiz)")
+        root = os.path.realpath(self.files_root)
+        path = os.path.realpath(os.path.join(root, ruta))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            raise ValueError("Ruta no válida")
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def create_server(document_service: DocumentService, host: str, port: int, workers: int, max_pending: int,
+                  files_root: Optional[str] = None, sync_timeout: float = 600) -> ThreadingHTTPServer:
+    """Crea el servidor HTTP (sin iniciarlo) sobre un DocumentService ya construido.
+    Cada servidor usa su propia subclase del manejador, con sus propias dependencias."""
+    handler = type("Handler", (RequestHandler,), {
+        "jobs": JobManager(document_service, workers, max_pending),
+        "files_root": files_root,
+        "sync_timeout": sync_timeout
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    """Inicia el servicio HTTP"""
+    config = Config()
+    parser = argparse.ArgumentParser(description="Servicio HTTP de procesamiento de dictámenes JNCI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="Documentos procesados en simultáneo")
+    parser.add_argument("--max-pendientes", type=int, default=16,
+                        help="Máximo de documentos en cola o en proceso antes de rechazar solicitudes")
+    parser.add_argument("--timeout-sync", type=float, default=600,
+                        help="Segundos de espera en modo síncrono antes de responder con el id del trabajo")
+    parser.add_argument("--raiz", help="Directorio desde el que se permite leer PDFs por ruta")
+    args = parser.parse_args()
+
+    configure_openai()
+    document_service = create_document_service(
+        config,
+        ResultCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS),
+        ProcessPoolExecutor(max_workers=config.RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")),
+        ThreadPoolExecutor(max_workers=config.OCR_POOL_WORKERS, thread_name_prefix="ocr"),
+        ThreadPoolExecutor(max_workers=config.OCR_POOL_WORKERS, thread_name_prefix="ocr-tile")
+        if config.OCR_TILES > 1 else None,
+        PromptCacheStats()
+    )
+    server = create_server(document_service, args.host, args.port, args.workers, args.max_pendientes,
+                           args.raiz, args.timeout_sync)
+    print(f"Servicio escuchando en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
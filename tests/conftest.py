@@ -0,0 +1,51 @@
+import base64
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.standin import StandIn  # noqa: E402
+
+PAGES_PER_PDF = 3
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """Servidor sustituto de OpenAI; la biblioteca openai apunta a él durante la prueba"""
+    import openai
+    server = StandIn().start()
+    monkeypatch.setattr(openai, "api_base", server.api_base)
+    monkeypatch.setattr(openai, "api_key", "prueba")
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_render(monkeypatch):
+    """Sustituye la rasterización (poppler) por imágenes cuyo contenido es el texto "<pdf> página N".
+    La tinta es mínima para que el OCR adaptativo no repita las páginas."""
+    import pdf_workers
+
+    def count_pages(pdf_path):
+        return PAGES_PER_PDF
+
+    def render_pages(pdf_path, first_page, last_page, dpi):
+        with open(pdf_path, "rb") as f:
+            nombre = f.read().decode("utf-8").split("\n")[-1]
+        return [
+            (base64.b64encode(f"{nombre} página {i}".encode("utf-8")).decode("ascii"), 0.001)
+            for i in range(first_page, last_page + 1)
+        ]
+
+    monkeypatch.setattr(pdf_workers, "count_pages", count_pages)
+    monkeypatch.setattr(pdf_workers, "render_pages", render_pages)
+
+
+def make_pdf(directory, nombre: str) -> str:
+    """Escribe un "PDF" de prueba cuyas páginas renderiza fake_render"""
+    path = os.path.join(str(directory), nombre + ".pdf")
+    with open(path, "wb") as f:
+        f.write(f"%PDF-1.4 prueba\n{nombre}".encode("utf-8"))
+    return path
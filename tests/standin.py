@@ -0,0 +1,261 @@
+"""Servidor sustituto de la API de OpenAI para pruebas locales, sin red ni costo.
+
+Implementa POST /v1/chat/completions, POST /v1/files, GET /v1/files/<id>/content,
+POST /v1/batches y GET /v1/batches/<id>. Cada operación se reconoce por su prompt de
+sistema (ver prompts.PROMPTS) y recibe una respuesta determinista:
+
+    extract_text_from_image  "Texto OCR de <contenido de la imagen>"
+    correct_text             el mismo texto recibido
+    extract_* con JSON       campos de ejemplo (RESPUESTAS_JSON)
+    otras                    "<operación>: respuesta de prueba"
+
+Uso manual:
+
+    python tests/standin.py --port 8080
+    OPENAI_API_BASE=http://127.0.0.1:8080/v1 OPENAI_API_KEY=prueba python server.py
+"""
+import argparse
+import base64
+import binascii
+import email.parser
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prompts import PROMPTS  # noqa: E402
+
+RESPUESTAS_JSON = {
+    "extract_pcl_info": {
+        "ubicacion": "Antioquia",
+        "numero_dictamen": "77",
+        "fecha_dictamen": "12/03/2024",
+        "diagnosticos": ["Lumbalgia crónica"],
+        "deficiencia_total": "18,50",
+        "rol_laboral": "9,20",
+        "pcl_total": "27,70",
+        "origen": "Enfermedad común",
+        "fecha_estructuracion": "01/02/2024",
+        "deficiencias_calificadas": [{"nombre": "Columna lumbar", "porcentaje": "18,50", "fuente": "Tabla 15.3"}],
+        "analisis_conclusiones": "Se confirma el dictamen",
+        "valoracion_calificador": "Sin observaciones",
+        "otros_conceptos": None
+    },
+    "extract_first_opportunity_info": {
+        "tipo_entidad": "ARL",
+        "nombre_entidad": "POSITIVA",
+        "diagnosticos": [{"diagnostico": "Hernia discal", "diagnostico_especifico": "L4-L5",
+                          "lateralidad": None, "origen": "Enfermedad común"}],
+        "deficiencias": [{"nombre": "Columna lumbar", "porcentaje": "18,50"}],
+        "deficiencia_total": "18,50",
+        "rol_laboral": "9,20",
+        "pcl_total": "27,70",
+        "origen": "Enfermedad común",
+        "fecha_estructuracion": "01/02/2024",
+        "conceptos_medicos": [],
+        "pruebas_especificas": []
+    },
+    "extract_first_opportunity_origin_info": {
+        "tipo_entidad": "EPS",
+        "nombre_entidad": "SURA",
+        "diagnosticos": [{"nombre": "Túnel carpiano", "lateralidad": "derecho", "origen": "Enfermedad laboral"}],
+        "conceptos_medicos": [],
+        "pruebas_especificas": []
+    }
+}
+
+_OPERATIONS = {prompt.system: name for name, prompt in PROMPTS.items()}
+
+
+def operation_of(messages: List[Dict]) -> Optional[str]:
+    """Operación a la que corresponde una solicitud, según su prompt de sistema"""
+    return _OPERATIONS.get(messages[0]["content"]) if messages else None
+
+
+def default_answer(operation: Optional[str], messages: List[Dict]) -> str:
+    """Respuesta determinista de cada operación"""
+    content = messages[-1]["content"]
+    if operation == "extract_text_from_image":
+        url = next(part["image_url"]["url"] for part in content if part["type"] == "image_url")
+        try:
+            imagen = base64.b64decode(url.split(",", 1)[1]).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError):
+            imagen = "la imagen"
+        return f"Texto OCR de {imagen}"
+    if operation == "correct_text":
+        return content.split("\n\n", 1)[1]
+    if operation in RESPUESTAS_JSON:
+        return json.dumps(RESPUESTAS_JSON[operation], ensure_ascii=False)
+    return f"{operation}: respuesta de prueba"
+
+
+class StandIn:
+    """Servidor sustituto en un hilo. answer(operación, mensajes) permite cambiar las respuestas
+    y delay simula la latencia de cada llamada."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0,
+                 answer: Optional[Callable[[Optional[str], List[Dict]], str]] = None):
+        self.delay = delay
+        self.answer = answer or default_answer
+        self.chat_calls: List[str] = []
+        self.batch_calls: List[Optional[str]] = []
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def api_base(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    def completion(self, body: Dict) -> Dict:
+        """Cuerpo de respuesta de /v1/chat/completions, con uso de tokens simulado"""
+        operation = operation_of(body.get("messages", []))
+        content = self.answer(operation, body["messages"])
+        prompt_tokens = len(json.dumps(body["messages"], ensure_ascii=False)) // 4
+        prefix_tokens = len(PROMPTS[operation].system) // 4 if operation in PROMPTS else 0
+        return {
+            "id": self._new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+                "prompt_tokens_details": {"cached_tokens": prefix_tokens if prefix_tokens >= 1024 else 0}
+            }
+        }
+
+    def _run_batch(self, batch: Dict):
+        """Resuelve todas las solicitudes del lote y guarda el archivo de salida"""
+        lines = self.files[batch["input_file_id"]].decode("utf-8").splitlines()
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            with self._lock:
+                self.batch_calls.append(operation_of(item["body"]["messages"]))
+            output.append(json.dumps({
+                "id": self._new_id("batch_req"),
+                "custom_id": item["custom_id"],
+                "response": {"status_code": 200, "body": self.completion(item["body"])},
+                "error": None
+            }, ensure_ascii=False))
+        output_id = self._new_id("file")
+        self.files[output_id] = ("\n".join(output) + "\n").encode("utf-8")
+        batch["output_file_id"] = output_id
+        batch["request_counts"] = {"total": len(output), "completed": len(output), "failed": 0}
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                if path == "/v1/chat/completions":
+                    body = json.loads(self._body())
+                    with standin._lock:
+                        standin.chat_calls.append(operation_of(body["messages"]))
+                    time.sleep(standin.delay)
+                    self._send_json(200, standin.completion(body))
+                elif path == "/v1/files":
+                    message = email.parser.BytesParser().parsebytes(
+                        b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._body()
+                    )
+                    parts = {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+                    file_id = standin._new_id("file")
+                    standin.files[file_id] = parts["file"].get_payload(decode=True)
+                    self._send_json(200, {"id": file_id, "object": "file", "purpose": parts["purpose"].get_payload(),
+                                          "bytes": len(standin.files[file_id])})
+                elif path == "/v1/batches":
+                    params = json.loads(self._body())
+                    if params.get("input_file_id") not in standin.files:
+                        self._send_json(400, {"error": {"message": "input_file_id no existe", "type": "invalid_request_error"}})
+                        return
+                    batch = {"id": standin._new_id("batch"), "object": "batch", "status": "validating",
+                             "input_file_id": params["input_file_id"], "endpoint": params.get("endpoint"),
+                             "output_file_id": None}
+                    standin.batches[batch["id"]] = batch
+                    self._send_json(200, batch)
+                else:
+                    self._send_json(404, {"error": {"message": "ruta no encontrada", "type": "invalid_request_error"}})
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "content" and parts[2] in standin.files:
+                    payload = standin.files[parts[2]]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                elif len(parts) == 3 and parts[:2] == ["v1", "batches"] and parts[2] in standin.batches:
+                    batch = standin.batches[parts[2]]
+                    # Un lote pasa por "in_progress" antes de completarse, como en la API real
+                    if batch["status"] == "validating":
+                        batch["status"] = "in_progress"
+                    elif batch["status"] == "in_progress":
+                        standin._run_batch(batch)
+                        batch["status"] = "completed"
+                    self._send_json(200, batch)
+                else:
+                    self._send_json(404, {"error": {"message": "ruta no encontrada", "type": "invalid_request_error"}})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor sustituto de la API de OpenAI para pruebas locales")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--demora", type=float, default=0.0, help="Segundos de espera por llamada de chat")
+    args = parser.parse_args()
+    standin = StandIn(args.host, args.port, args.demora)
+    print(f"Servidor sustituto en {standin.api_base}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
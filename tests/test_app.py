@@ -0,0 +1,62 @@
+import contextlib
+import os
+import types
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("JNCI_CASE_STORE", str(tmp_path / "casos.db"))
+    monkeypatch.setenv("JNCI_SHOW_TIMINGS", "1")
+    import streamlit as st
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["openai"] = {"OPENAI_API_KEY": "prueba"}
+    return at
+
+
+def test_la_aplicacion_carga_sin_errores(app):
+    app.run()
+    assert not app.exception
+    assert not app.error
+    assert len(app.tabs) == 3
+
+
+def test_mide_las_ejecuciones_de_los_fragmentos(app):
+    app.run()
+    app.text_input(key="search_text").input("lumbalgia").run()
+
+    captions = [caption.value for caption in app.caption]
+    assert any(c.startswith("busqueda: ") and "ejecuciones: 2" in c for c in captions)
+    assert any(c.startswith("arranque_ms: ") and "recargas: 1" in c for c in captions)
+
+
+class ServicioFijo:
+    def __init__(self, completo):
+        self.case_store = None
+        self.completo = completo
+
+    def process(self, tipo, pdf_bytes, nombre, on_page=None):
+        return {"completo": self.completo, "texto_reutilizado": False, "plantilla": "plantilla",
+                "paginas": ["texto", "[Página no procesada]"]}
+
+
+@pytest.mark.parametrize("completo, estados", [(True, ["success"]), (False, ["warning"])])
+def test_solo_los_resultados_completos_muestran_exito(monkeypatch, completo, estados):
+    import app as modulo
+    llamadas = []
+    for nombre in ("success", "warning", "info"):
+        monkeypatch.setattr(modulo.st, nombre, lambda *args, _nombre=nombre, **kwargs: llamadas.append(_nombre))
+    monkeypatch.setattr(modulo.st, "progress", lambda *args, **kwargs: types.SimpleNamespace(
+        progress=lambda *a, **k: None, empty=lambda: None
+    ))
+    monkeypatch.setattr(modulo.st, "expander", lambda *args, **kwargs: contextlib.nullcontext())
+    monkeypatch.setattr(modulo.st, "text_area", lambda *args, **kwargs: None)
+
+    archivo = types.SimpleNamespace(getvalue=lambda: b"%PDF", name="dictamen.pdf")
+    modulo.StreamlitUI(ServicioFijo(completo))._process_document("junta_regional_pcl", archivo)
+    assert llamadas == estados
@@ -0,0 +1,162 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+from app import CaseStore, Config
+from bulk import BatchClient, BulkProcessor
+from tests.conftest import PAGES_PER_PDF, make_pdf
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptingClient(BatchClient):
+    """Simula un proceso interrumpido mientras espera el lote número interrupt_at"""
+
+    def __init__(self, interrupt_at: int):
+        super().__init__()
+        self.submitted = 0
+        self.interrupt_at = interrupt_at
+
+    def submit(self, jsonl_path):
+        self.submitted += 1
+        return super().submit(jsonl_path)
+
+    def status(self, batch_id):
+        if self.submitted == self.interrupt_at:
+            self.interrupt_at = None
+            raise Interrupted()
+        return super().status(batch_id)
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.CASE_STORE_PATH = str(tmp_path / "casos.db")
+    config.BATCH_POLL_SECONDS = 0
+    config.PAGES_PER_TASK = 2
+    return config
+
+
+def test_rondas_y_reanudacion(tmp_path, config, standin, fake_render):
+    work_dir = str(tmp_path / "trabajo")
+    junta = make_pdf(tmp_path, "junta")
+    recurso = make_pdf(tmp_path, "recurso")
+
+    processor = BulkProcessor(config, work_dir, InterruptingClient(interrupt_at=2))
+    processor.add([junta], "junta_regional_pcl")
+    processor.add([recurso], "recurso_reposicion")
+    with pytest.raises(Interrupted):
+        processor.run(log=lambda mensaje: None)
+
+    # Un proceso nuevo retoma el lote en curso sin reenviar lo ya resuelto
+    processor = BulkProcessor(config, work_dir, BatchClient())
+    documentos = processor.run(log=lambda mensaje: None)
+
+    assert {info["nombre"]: info["estado"] for info in documentos.values()} == {
+        "junta.pdf": "completado", "recurso.pdf": "completado"
+    }
+    # OCR, corrección, extracción; el recurso necesita una ronda más para la entidad
+    assert processor.state["ronda"] == 4
+    assert Counter(standin.batch_calls) == {
+        "extract_text_from_image": 2 * PAGES_PER_PDF,
+        "correct_text": 2 * PAGES_PER_PDF,
+        "extract_pcl_info": 1,
+        "process_recurring_text": 1,
+        "extract_recurring_entity": 1,
+    }
+    assert standin.chat_calls == []
+    assert len(os.listdir(os.path.join(work_dir, "paginas", CaseStore.document_id(open(junta, "rb").read())))) == PAGES_PER_PDF
+
+    store = CaseStore(config.CASE_STORE_PATH)
+    [caso] = store.search(numero_dictamen="77")
+    assert caso["campos"]["extract_pcl_info"]["pcl_total"] == "27,70"
+    assert store.get_pages(caso["documento"])[0].startswith("Texto OCR de junta página 1")
+
+    # Reanudar un trabajo terminado no envía nada
+    enviados = len(standin.batch_calls)
+    BulkProcessor(config, work_dir, BatchClient()).run(log=lambda mensaje: None)
+    assert len(standin.batch_calls) == enviados
+
+
+def test_respuesta_json_invalida_se_vuelve_a_solicitar(tmp_path, config, standin, fake_render):
+    answer = standin.answer
+    invalidas = []
+
+    def con_bloque_de_codigo_la_primera_vez(operation, messages):
+        content = answer(operation, messages)
+        if operation == "extract_pcl_info" and not invalidas:
+            invalidas.append(operation)
+            return f"```json\n{content}\n```"
+        return content
+
+    standin.answer = con_bloque_de_codigo_la_primera_vez
+    work_dir = str(tmp_path / "trabajo")
+    processor = BulkProcessor(config, work_dir, BatchClient())
+    processor.add([make_pdf(tmp_path, "junta")], "junta_regional_pcl")
+    [info] = processor.run(log=lambda mensaje: None).values()
+
+    assert info["estado"] == "completado"
+    assert standin.batch_calls.count("extract_pcl_info") == 2
+    [caso] = CaseStore(config.CASE_STORE_PATH).search(numero_dictamen="77")
+    assert caso["campos"]["extract_pcl_info"]["numero_dictamen"] == "77"
+
+
+def test_respuesta_json_siempre_invalida_no_guarda_el_caso(tmp_path, config, standin, fake_render):
+    answer = standin.answer
+
+    def siempre_invalida(operation, messages):
+        content = answer(operation, messages)
+        return f"```json\n{content}\n```" if operation == "extract_pcl_info" else content
+
+    standin.answer = siempre_invalida
+    config.BATCH_MAX_ROUNDS = 4
+    processor = BulkProcessor(config, str(tmp_path / "trabajo"), BatchClient())
+    processor.add([make_pdf(tmp_path, "junta")], "junta_regional_pcl")
+    [info] = processor.run(log=lambda mensaje: None).values()
+
+    assert info["estado"] == "error"
+    assert CaseStore(config.CASE_STORE_PATH).search() == []
+
+
+def test_documento_parcial_no_se_guarda_como_caso(tmp_path, config, standin, fake_render, monkeypatch):
+    from app import OpenAIService
+
+    def falla(self, text):
+        raise KeyError("campo inesperado")
+
+    monkeypatch.setattr(OpenAIService, "extract_pcl_info", falla)
+    processor = BulkProcessor(config, str(tmp_path / "trabajo"), BatchClient())
+    processor.add([make_pdf(tmp_path, "junta")], "junta_regional_pcl")
+    [info] = processor.run(log=lambda mensaje: None).values()
+
+    assert info["estado"] == "parcial"
+    assert CaseStore(config.CASE_STORE_PATH).search() == []
+    with open(info["salida"], encoding="utf-8") as f:
+        assert f.read().startswith("[RESULTADO PARCIAL - información no extraída: extract_pcl_info]")
+    with open(info["salida"][:-4] + ".json", encoding="utf-8") as f:
+        assert json.load(f)["caso_id"] is None
+
+
+def test_reutiliza_el_texto_ya_procesado(tmp_path, config, standin, fake_render):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app import ResultCache, create_document_service
+
+    path = make_pdf(tmp_path, "junta")
+    pool = ThreadPoolExecutor(max_workers=4)
+    with open(path, "rb") as f:
+        create_document_service(config, ResultCache(100, 3600), pool, pool).process("junta_regional_pcl", f.read())
+    assert standin.chat_calls.count("extract_text_from_image") == PAGES_PER_PDF
+
+    processor = BulkProcessor(config, str(tmp_path / "trabajo"), BatchClient())
+    processor.add([path], "recurso_reposicion")
+    [info] = processor.run(log=lambda mensaje: None).values()
+
+    assert info["estado"] == "completado"
+    assert "extract_text_from_image" not in standin.batch_calls
+    assert "correct_text" not in standin.batch_calls
+    assert not os.path.exists(os.path.join(str(tmp_path / "trabajo"), "paginas", CaseStore.document_id(open(path, "rb").read())))
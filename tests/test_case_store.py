@@ -0,0 +1,41 @@
+from app import CaseStore
+
+
+def test_reprocesar_reemplaza_el_caso(tmp_path):
+    store = CaseStore(str(tmp_path / "casos.db"))
+    documento = CaseStore.document_id(b"%PDF dictamen")
+    store.save_pages(documento, "dictamen.pdf", ["pagina uno", "pagina dos"])
+
+    ids = {
+        store.save_case(documento, "junta_regional_pcl", {"n": i}, f"plantilla version {i}", numero_dictamen="77")
+        for i in range(3)
+    }
+    store.save_case(documento, "recurso_reposicion", {}, "plantilla del recurso")
+
+    assert len(ids) == 1
+    casos = store.search(numero_dictamen="77")
+    assert len(casos) == 1
+    assert casos[0]["plantilla"] == "plantilla version 2"
+    assert sorted(c["tipo"] for c in store.search(texto="version")) == ["junta_regional_pcl", "recurso_reposicion"]
+    # Reprocesar un tipo no borra la plantilla indexada del otro
+    assert len(store.search(texto="recurso")) == 2
+    # Volver a guardar las páginas no borra las plantillas del índice
+    store.save_pages(documento, "dictamen.pdf", ["pagina uno"])
+    assert len(store.search(texto="version")) == 2
+    with store._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM indice WHERE origen LIKE 'plantilla%'").fetchone()[0] == 2
+
+
+def test_busquedas_por_numero_y_fecha_usan_indice(tmp_path):
+    store = CaseStore(str(tmp_path / "casos.db"))
+    store.save_case("d1", "junta_regional_pcl", {}, "plantilla", numero_dictamen="77", fecha="12/03/2024")
+    store.save_case("d2", "junta_regional_pcl", {}, "plantilla", numero_dictamen="177", fecha="12/03/2023")
+
+    assert [c["documento"] for c in store.search(numero_dictamen=" 77 ")] == ["d1"]
+    assert [c["documento"] for c in store.search(fecha="12/03/2024")] == ["d1"]
+    with store._connect() as conn:
+        for columna in ("numero_dictamen", "fecha"):
+            plan = " ".join(row["detail"] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM casos c WHERE c.{columna} = ?", ("77",)
+            ))
+            assert "USING INDEX" in plan, plan
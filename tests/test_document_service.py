@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import CaseStore, Config, DocumentService, OpenAIService, ResultCache, create_document_service
+from tests.conftest import PAGES_PER_PDF
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config()
+    config.CASE_STORE_PATH = str(tmp_path / "casos.db")
+    return config
+
+
+def pdf(nombre):
+    return f"%PDF-1.4 prueba\n{nombre}".encode("utf-8")
+
+
+def test_resultado_incluye_el_texto_de_cada_pagina(config, standin, fake_render):
+    pool = ThreadPoolExecutor(max_workers=4)
+    service = create_document_service(config, ResultCache(100, 3600), pool, pool)
+    resultado = service.process("junta_regional_pcl", pdf("completo"))
+
+    assert resultado["completo"]
+    assert resultado["paginas"] == [f"Texto OCR de completo página {i}\n" for i in range(1, PAGES_PER_PDF + 1)]
+
+
+def test_resultado_parcial_marca_las_paginas_faltantes(config, standin, fake_render):
+    answer = standin.answer
+
+    def lento_en_la_pagina_2(operation, messages):
+        content = answer(operation, messages)
+        if operation == "extract_text_from_image" and content.endswith("página 2"):
+            time.sleep(3)
+        return content
+
+    standin.answer = lento_en_la_pagina_2
+    pool = ThreadPoolExecutor(max_workers=4)
+    service = create_document_service(config, ResultCache(100, 3600), pool, pool)
+    resultado = service.process("junta_regional_pcl", pdf("parcial"), budget_seconds=1.5)
+
+    assert not resultado["completo"]
+    assert resultado["caso_id"] is None
+    assert resultado["paginas_faltantes"] == [2]
+    assert resultado["paginas"][1] == DocumentService.MISSING_PAGE
+    assert resultado["paginas"][0].startswith("Texto OCR de parcial página 1")
+    assert resultado["plantilla"].startswith("[RESULTADO PARCIAL")
+    assert not CaseStore(config.CASE_STORE_PATH).search(numero_dictamen="77")
+
+
+def test_respeta_el_presupuesto_con_el_pool_de_rasterizacion_ocupado(config, standin, fake_render):
+    render_pool = ThreadPoolExecutor(max_workers=1)
+    render_pool.submit(time.sleep, 3)  # Trabajo de otra sesión que ocupa el pool compartido
+    service = create_document_service(config, ResultCache(100, 3600), render_pool, ThreadPoolExecutor(4))
+
+    inicio = time.monotonic()
+    with pytest.raises(RuntimeError):
+        service.process("junta_regional_pcl", pdf("en_cola"), budget_seconds=0.5)
+    assert time.monotonic() - inicio < 1.5
+
+
+class FallaAlProcesarElRecurso(OpenAIService):
+    llamadas_entidad = 0
+
+    def process_recurring_text(self, text):
+        raise TimeoutError("se agotó el tiempo")
+
+    def extract_recurring_entity(self, text):
+        self.llamadas_entidad += 1
+        return "El señor Inventado"
+
+
+def test_recurso_sin_texto_procesado_no_extrae_la_entidad(config):
+    service = FallaAlProcesarElRecurso(config)
+    campos, plantilla, claves, faltantes = DocumentService(service, None, None).extract(
+        "recurso_reposicion", "texto del recurso", service
+    )
+
+    assert service.llamadas_entidad == 0
+    assert faltantes == ["process_recurring_text", "extract_recurring_entity"]
+    assert campos["extract_recurring_entity"] == "[Entidad no identificada]"
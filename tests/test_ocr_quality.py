@@ -0,0 +1,56 @@
+import pytest
+
+from app import Config, OCRQuality
+
+CHARS_PER_INK = Config.OCR_CHARS_PER_INK
+
+DICTAMEN = """
+DICTAMEN DE DETERMINACIÓN DE ORIGEN Y/O PÉRDIDA DE CAPACIDAD LABORAL Y OCUPACIONAL
+Junta Regional de Calificación de Invalidez de Antioquia. Dictamen No. 71234567 del 12/03/2024.
+Motivo de calificación: el trabajador solicita la calificación de la pérdida de capacidad laboral
+por síndrome del túnel carpiano bilateral y lumbalgia crónica con hernia discal L4-L5.
+Conceptos médicos: ortopedia conceptúa instrucción en higiene postural y construcción de un plan
+de rehabilitación; transcripción de la historia clínica con obstrucción parcial del canal medular.
+Pruebas específicas: electromiografía con neuropatía del mediano; resonancia magnética nuclear
+con abstracto de hallazgos compatibles con protrusión discal. Fundamentos de derecho: Decreto 1507
+de 2014. Análisis y conclusiones: se califica deficiencia de 18,50% y rol laboral de 9,20%.
+"""
+
+ILEGIBLE = """
+DlCTAMFN DF DFTFRMlNAClQN DF QRlGFN Y/Q PFRDlDA DF CAPAClDAD LABQRAL
+Jvnta Rgnl dd Clfcn dd lnvlddz dd Antqqa. Dctmn Nq. 7l2345 dl l2/03/2Q24.
+Mtvq dd clfcxn: ll trbjdrr slcta ll clfcn dd ll prdd dd cpcdd lbrl [ilegible]
+prr sndrm dl tnl crpn bltrl y lmblg crnc cn hrn dscl ???? L4-L5.
+"""
+
+
+@pytest.mark.parametrize("palabra", [
+    "instrucción", "construcción", "transcripción", "obstrucción", "abstracto",
+    "inscripción", "transplante", "electromiografía", "monstruo"
+])
+def test_acepta_grupos_consonanticos_del_espanol(palabra):
+    assert OCRQuality._is_word(palabra)
+
+
+@pytest.mark.parametrize("token", ["trbjdrr", "sndrm", "lllave", "cpcdd", "prstrl"])
+def test_rechaza_tokens_sin_patron_espanol(token):
+    assert not OCRQuality._is_word(token)
+
+
+def test_texto_limpio_no_dispara_reintento():
+    ink = len(DICTAMEN.strip()) / CHARS_PER_INK
+    assert OCRQuality.score(DICTAMEN, ink, CHARS_PER_INK) >= 0.95
+    assert OCRQuality.score(DICTAMEN, ink, CHARS_PER_INK) > Config.OCR_RETRY_THRESHOLD
+
+
+def test_texto_ilegible_dispara_reintento():
+    ink = len(ILEGIBLE.strip()) / CHARS_PER_INK
+    assert OCRQuality.score(ILEGIBLE, ink, CHARS_PER_INK) < Config.OCR_RETRY_THRESHOLD
+
+
+def test_texto_corto_para_la_tinta_dispara_reintento():
+    assert OCRQuality.score(DICTAMEN[:200], 0.2, CHARS_PER_INK) < Config.OCR_RETRY_THRESHOLD
+
+
+def test_pagina_en_blanco():
+    assert OCRQuality.score("", 0.001, CHARS_PER_INK) == 1.0
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app import PromptCacheStats
+from prompts import PROMPTS
+
+TEXT_PROMPTS = [name for name in PROMPTS if name != "extract_text_from_image"]
+
+
+@pytest.mark.parametrize("name", TEXT_PROMPTS)
+def test_prefijo_estable_y_documento_al_final(name):
+    prompt = PROMPTS[name]
+    uno = json.dumps(prompt.messages("documento uno"), ensure_ascii=False)
+    dos = json.dumps(prompt.messages("otro documento distinto"), ensure_ascii=False)
+    prefijo = json.dumps(prompt.messages(""), ensure_ascii=False)[:-len('"}]')]
+    assert uno.startswith(prefijo) and dos.startswith(prefijo)
+    assert prompt.messages("texto")[-1]["content"].endswith("\n\ntexto")
+
+
+def test_imagen_al_final():
+    [system, user] = PROMPTS["extract_text_from_image"].image_messages("AAAA")
+    assert system["content"] == PROMPTS["extract_text_from_image"].system
+    assert [part["type"] for part in user["content"]] == ["text", "image_url"]
+
+
+@pytest.mark.parametrize("name", PROMPTS)
+def test_prompts_sin_sangria_ni_espacios_finales(name):
+    for line in PROMPTS[name].system.splitlines():
+        assert line == line.rstrip()
+    assert not PROMPTS[name].system.startswith((" ", "\n"))
+
+
+def test_proporcion_de_tokens_en_cache_por_operacion():
+    stats = PromptCacheStats()
+    stats.record("extract_pcl_info", {"prompt_tokens": 2000, "prompt_tokens_details": {"cached_tokens": 1024}})
+    stats.record("extract_pcl_info", {"prompt_tokens": 2000, "prompt_tokens_details": None})
+    stats.record("correct_text", {"prompt_tokens": 500})
+    stats.record("correct_text", None)
+
+    resumen = stats.summary()
+    assert resumen["extract_pcl_info"] == {
+        "llamadas": 2, "tokens_entrada": 4000, "tokens_en_cache": 1024,
+        "version_prompt": PROMPTS["extract_pcl_info"].version, "proporcion_cache": 0.256
+    }
+    assert resumen["correct_text"]["proporcion_cache"] == 0.0
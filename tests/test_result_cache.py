@@ -0,0 +1,24 @@
+from app import ResultCache
+
+
+def test_clave_ignora_espacios_y_cuenta_aciertos():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    system = [{"role": "system", "content": "prompt"}]
+    key = ResultCache.make_key("op", "modelo", system + [{"role": "user", "content": "texto  del\ndocumento"}], 10)
+    same = ResultCache.make_key("op", "modelo", system + [{"role": "user", "content": "texto del documento"}], 10)
+    assert key == same
+
+    assert cache.get(key) is None
+    cache.set(key, "respuesta")
+    assert cache.get(same) == "respuesta"
+    assert cache.summary() == {"entradas": 1, "aciertos": 1, "fallos": 1, "proporcion_aciertos": 0.5}
+
+
+def test_descarta_las_menos_usadas():
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
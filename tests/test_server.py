@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import server
+from app import Config, PromptCacheStats, ResultCache, create_document_service
+from tests.conftest import PAGES_PER_PDF
+
+
+@pytest.fixture
+def start_service(tmp_path, standin, fake_render):
+    servers = []
+
+    def start(workers=2, max_pending=4, sync_timeout=30, files_root=str(tmp_path)):
+        config = Config()
+        config.CASE_STORE_PATH = str(tmp_path / "casos.db")
+        pool = ThreadPoolExecutor(max_workers=4)
+        document_service = create_document_service(
+            config, ResultCache(100, 3600), pool, pool, prompt_stats=PromptCacheStats()
+        )
+        http = server.create_server(document_service, "127.0.0.1", 0, workers, max_pending, files_root, sync_timeout)
+        threading.Thread(target=http.serve_forever, daemon=True).start()
+        servers.append(http)
+        return f"http://127.0.0.1:{http.server_address[1]}"
+
+    yield start
+    for http in servers:
+        http.shutdown()
+        http.server_close()
+
+
+def request(url, body=None, content_type="application/pdf"):
+    headers = {"Content-Type": content_type} if body is not None else {}
+    req = urllib.request.Request(url, data=body, headers=headers, method="POST" if body is not None else "GET")
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+
+def pdf(nombre):
+    return f"%PDF-1.4 prueba\n{nombre}".encode("utf-8")
+
+
+def wait_job(base, job_id):
+    for _ in range(200):
+        status, _, job = request(f"{base}/trabajos/{job_id}")
+        if job["estado"] in ("completado", "error"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("El trabajo no terminó")
+
+
+def test_sincrono_retorna_la_plantilla(start_service, standin):
+    base = start_service()
+    status, _, job = request(f"{base}/procesar/junta_regional_pcl", pdf("sincrono"))
+
+    assert status == 200
+    resultado = job["resultado"]
+    assert resultado["completo"] and resultado["caso_id"]
+    assert resultado["num_paginas"] == PAGES_PER_PDF
+    assert "27,70" in resultado["plantilla"]
+    assert standin.chat_calls.count("extract_text_from_image") == PAGES_PER_PDF
+
+    status, _, salud = request(f"{base}/salud")
+    assert status == 200 and salud["pendientes"] == 0
+    assert salud["cache_prompts"]["extract_pcl_info"]["llamadas"] == 1
+
+
+def test_asincrono_y_por_ruta(start_service, tmp_path):
+    (tmp_path / "recurso.pdf").write_bytes(pdf("recurso"))
+    base = start_service()
+    status, headers, body = request(
+        f"{base}/procesar/recurso_reposicion?modo=async", json.dumps({"ruta": "recurso.pdf"}).encode(), "application/json"
+    )
+
+    assert status == 202
+    assert headers["Location"] == f"/trabajos/{body['id']}"
+    job = wait_job(base, body["id"])
+    assert job["estado"] == "completado"
+    assert job["nombre"] == "recurso.pdf"
+    assert job["resultado"]["completo"]
+
+
+def test_saturado_responde_503_sin_leer_el_cuerpo(start_service, standin):
+    standin.delay = 0.3
+    base = start_service(workers=1, max_pending=1)
+    status, _, first = request(f"{base}/procesar/junta_regional_pcl?modo=async", pdf("lento"))
+    assert status == 202
+
+    status, headers, body = request(f"{base}/procesar/junta_regional_pcl", pdf("rechazado"))
+    assert status == 503
+    assert headers["Retry-After"] == "30"
+
+    assert wait_job(base, first["id"])["estado"] == "completado"
+    standin.delay = 0
+    status, _, _ = request(f"{base}/procesar/junta_regional_pcl", pdf("admitido"))
+    assert status == 200
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b"[]", "application/json"),
+    (b'"ruta"', "application/json"),
+    (b"{no es json", "application/json"),
+    (b'{"pdf_base64": "%%%"}', "application/json"),
+    (b'{"ruta": "../fuera.pdf"}', "application/json"),
+    (b"no es un pdf", "application/pdf"),
+])
+def test_solicitudes_invalidas_liberan_el_cupo(start_service, body, content_type):
+    base = start_service(workers=1, max_pending=1)
+    status, _, error = request(f"{base}/procesar/junta_regional_pcl", body, content_type)
+    assert status == 400 and error["error"]
+
+    status, _, _ = request(f"{base}/procesar/junta_regional_pcl", pdf("valido"))
+    assert status == 200
+
+
+def test_dos_servidores_no_comparten_dependencias(start_service, tmp_path):
+    (tmp_path / "propio.pdf").write_bytes(pdf("propio"))
+    saturado = start_service(workers=1, max_pending=1)
+    libre = start_service(workers=2, max_pending=4, files_root=None)
+
+    _, _, salud_saturado = request(f"{saturado}/salud")
+    _, _, salud_libre = request(f"{libre}/salud")
+    assert (salud_saturado["max_pendientes"], salud_libre["max_pendientes"]) == (1, 4)
+
+    body = json.dumps({"ruta": "propio.pdf"}).encode()
+    assert request(f"{saturado}/procesar/junta_regional_pcl", body, "application/json")[0] == 200
+    assert request(f"{libre}/procesar/junta_regional_pcl", body, "application/json")[0] == 400
@@ -0,0 +1,58 @@
+from app import OCRPipeline
+
+
+def stitch(*bands):
+    return OCRPipeline._stitch_bands(list(bands)).splitlines()
+
+
+def test_elimina_el_solapamiento_en_el_borde():
+    a = "Diagnóstico principal: lumbalgia crónica\nFecha de estructuración: 12/03/2024\nOrigen: enferm"
+    b = "Fecha de estructuración: 12/03/2024\nOrigen: enfermedad común\nPCL total: 27,70%"
+    assert stitch(a, b) == [
+        "Diagnóstico principal: lumbalgia crónica",
+        "Fecha de estructuración: 12/03/2024",
+        "Origen: enfermedad común",
+        "PCL total: 27,70%",
+    ]
+
+
+def test_descarta_lineas_cortadas_en_ambos_bordes():
+    a = "Conceptos médicos de ortopedia\nHernia discal L4-L5 con radiculopatía\nElectromiografía de miembros inf"
+    b = "de ortopedia\nHernia discal L4-L5 con radiculopatía\nElectromiografía de miembros inferiores normal"
+    assert stitch(a, b) == [
+        "Conceptos médicos de ortopedia",
+        "Hernia discal L4-L5 con radiculopatía",
+        "Electromiografía de miembros inferiores normal",
+    ]
+
+
+def test_separadores_de_tabla_repetidos_no_pierden_filas():
+    a = "| Deficiencia | % |\n|---|---|\n| Deficiencia A | 10 |\n| Deficiencia B | 5 |"
+    b = "| Deficiencia C | 3 |\n|---|---|\n| Total | 18 |"
+    lines = stitch(a, b)
+    for fila in ("Deficiencia A", "Deficiencia B", "Deficiencia C", "Total"):
+        assert any(fila in line for line in lines)
+    assert lines == a.splitlines() + b.splitlines()
+
+
+def test_filas_repetidas_lejos_del_borde_no_se_unen():
+    a = "Deficiencias\nX 2\nTotal\nZ 5"
+    b = "Z 5\nW 3\nTotal\nV 1"
+    assert stitch(a, b) == a.splitlines() + b.splitlines()
+
+
+def test_solapamiento_de_filas_de_tabla_en_el_borde():
+    a = "| Deficiencia A | 10 |\n| Deficiencia B | 5 |\n| Deficiencia C | 3 |"
+    b = "| Deficiencia B | 5 |\n| Deficiencia C | 3 |\n| Total | 18 |"
+    assert stitch(a, b) == [
+        "| Deficiencia A | 10 |",
+        "| Deficiencia B | 5 |",
+        "| Deficiencia C | 3 |",
+        "| Total | 18 |",
+    ]
+
+
+def test_ignora_lineas_en_blanco_del_ocr():
+    a = "Análisis y conclusiones de la Junta\n\nSe confirma el dictamen"
+    b = "Se confirma el dictamen\nen todas sus partes"
+    assert stitch(a, b) == ["Análisis y conclusiones de la Junta", "", "Se confirma el dictamen", "en todas sus partes"]